@@ -0,0 +1,261 @@
+from contextlib import closing
+from datetime import datetime, timezone
+from pathlib import Path
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from au.common.datetime import date_to_utc, format_github_datetime
+
+from .classroom_types import (
+    Classroom,
+    ClassroomTree,
+    Assignment,
+    AcceptedAssignment,
+    decode,
+)
+from .gh_cache import get_default_cache_dir
+
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_FILE_ENV = "AU_CLASSROOM_INDEX"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS classrooms (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    archived INTEGER NOT NULL,
+    json TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS assignments (
+    id INTEGER PRIMARY KEY,
+    classroom_id INTEGER,
+    slug TEXT,
+    title TEXT NOT NULL,
+    deadline TEXT,
+    json TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS assignments_classroom ON assignments(classroom_id);
+CREATE TABLE IF NOT EXISTS accepted_assignments (
+    id INTEGER PRIMARY KEY,
+    assignment_id INTEGER NOT NULL,
+    login TEXT,
+    repo_name TEXT NOT NULL,
+    commit_count INTEGER NOT NULL,
+    json TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS accepted_assignment ON accepted_assignments(assignment_id);
+CREATE TABLE IF NOT EXISTS sync_log (
+    scope TEXT PRIMARY KEY,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def get_default_index_file() -> Path:
+    if os.environ.get(INDEX_FILE_ENV):
+        return Path(os.environ[INDEX_FILE_ENV])
+    return get_default_cache_dir().parent / "classroom_index.sqlite"
+
+
+class ClassroomIndex:
+    """
+    Local SQLite mirror of classrooms, assignments and accepted assignments,
+    written by `au classroom sync`. The get_* functions of classroom_api answer
+    from it under --offline, or when GitHub can't be reached.
+
+    It is only a fallback, not a query cache: it is read by classroom or
+    assignment id, the same lookups as the API, so only those columns are
+    indexed. Online commands always ask GitHub (whose answers the response
+    cache keeps cheap), rather than trusting data only as fresh as the last
+    sync.
+    """
+
+    _write_lock = threading.Lock()
+
+    def __init__(self, file: Path | None = None):
+        self.file = file or get_default_index_file()
+        self.file.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps this safe to use from
+        # the prefetch and async worker threads.
+        conn = sqlite3.connect(self.file, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    ###########################################################################
+    # Writing
+    ###########################################################################
+
+    @staticmethod
+    def _scope(kind: str, id: int | None = None) -> str:
+        return kind if id is None else f"{kind}:{id}"
+
+    def store_trees(self, trees: list[ClassroomTree]) -> None:
+        """
+        Replace what is stored for each classroom in trees (its assignments and
+        their accepted assignments), all in one transaction. Anything that
+        couldn't be retrieved (None in the tree) is left as it was, including
+        when it was last synced.
+        """
+        now = time.time()
+        with self._write_lock, closing(self._connect()) as conn, conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO classrooms VALUES (?, ?, ?, ?, ?)",
+                [
+                    (
+                        t.classroom.id,
+                        t.classroom.name,
+                        t.classroom.archived,
+                        t.classroom.as_json(),
+                        now,
+                    )
+                    for t in trees
+                ],
+            )
+            self._log_sync(conn, self._scope("classrooms"), now)
+            for tree in trees:
+                if tree.assignments is None:
+                    continue
+                assignments = [a.assignment for a in tree.assignments]
+                self._store_assignments(conn, tree.classroom.id, assignments, now)
+                for assignment_tree in tree.assignments:
+                    if assignment_tree.accepted_assignments is None:
+                        continue
+                    self._store_accepted_assignments(
+                        conn,
+                        assignment_tree.assignment.id,
+                        assignment_tree.accepted_assignments,
+                        now,
+                    )
+
+    def _store_assignments(
+        self,
+        conn: sqlite3.Connection,
+        classroom_id: int,
+        assignments: list[Assignment],
+        now: float,
+    ) -> None:
+        rows = [
+            (
+                a.id,
+                classroom_id,
+                a.slug,
+                a.title,
+                (
+                    format_github_datetime(date_to_utc(a.deadline))
+                    if a.deadline
+                    else None
+                ),
+                a.as_json(),
+                now,
+            )
+            for a in assignments
+        ]
+        conn.execute("DELETE FROM assignments WHERE classroom_id = ?", (classroom_id,))
+        self._log_sync(conn, self._scope("assignments", classroom_id), now)
+        conn.executemany(
+            "INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        for a in assignments:
+            self._log_sync(conn, self._scope("assignment", a.id), now)
+
+    def _store_accepted_assignments(
+        self,
+        conn: sqlite3.Connection,
+        assignment_id: int,
+        accepted_assignments: list[AcceptedAssignment],
+        now: float,
+    ) -> None:
+        rows = [
+            (
+                a.id,
+                assignment_id,
+                a.login,
+                a.repository.name,
+                a.commit_count,
+                a.as_json(),
+                now,
+            )
+            for a in accepted_assignments
+        ]
+        conn.execute(
+            "DELETE FROM accepted_assignments WHERE assignment_id = ?",
+            (assignment_id,),
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO accepted_assignments VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+        self._log_sync(conn, self._scope("accepted", assignment_id), now)
+
+    @staticmethod
+    def _log_sync(conn: sqlite3.Connection, scope: str, synced_at: float) -> None:
+        conn.execute(
+            "INSERT OR REPLACE INTO sync_log VALUES (?, ?)", (scope, synced_at)
+        )
+
+    ###########################################################################
+    # Reading
+    ###########################################################################
+
+    def _query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        with closing(self._connect()) as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def get_synced_at(self, kind: str, id: int | None = None) -> datetime | None:
+        """When the given scope was last retrieved from GitHub, if ever."""
+        rows = self._query(
+            "SELECT synced_at FROM sync_log WHERE scope = ?", (self._scope(kind, id),)
+        )
+        if not rows:
+            return None
+        return datetime.fromtimestamp(rows[0][0], tz=timezone.utc)
+
+    def get_classrooms(self, include_archived: bool = False) -> list[Classroom]:
+        sql = "SELECT json FROM classrooms"
+        if not include_archived:
+            sql += " WHERE archived = 0"
+        sql += " ORDER BY id"
+        return [decode(Classroom, json.loads(r[0])) for r in self._query(sql)]
+
+    def get_classroom(self, classroom_id: int) -> Classroom | None:
+        rows = self._query("SELECT json FROM classrooms WHERE id = ?", (classroom_id,))
+        return decode(Classroom, json.loads(rows[0][0])) if rows else None
+
+    def get_assignments(self, classroom_id: int) -> list[Assignment]:
+        rows = self._query(
+            "SELECT json FROM assignments WHERE classroom_id = ? ORDER BY id",
+            (classroom_id,),
+        )
+        return [decode(Assignment, json.loads(r[0])) for r in rows]
+
+    def get_assignment(self, assignment_id: int) -> Assignment | None:
+        rows = self._query(
+            "SELECT json FROM assignments WHERE id = ?", (assignment_id,)
+        )
+        return decode(Assignment, json.loads(rows[0][0])) if rows else None
+
+    def get_accepted_assignments(
+        self, assignment_id: int
+    ) -> list[AcceptedAssignment] | None:
+        """Returns None (rather than []) if the assignment was never synced."""
+        if not self.get_synced_at("accepted", assignment_id):
+            return None
+        rows = self._query(
+            "SELECT json FROM accepted_assignments WHERE assignment_id = ? ORDER BY id",
+            (assignment_id,),
+        )
+        return [decode(AcceptedAssignment, json.loads(r[0])) for r in rows]
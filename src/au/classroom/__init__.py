@@ -15,6 +15,18 @@ from .classroom_api import (
     get_assignments,
     get_assignment,
     get_accepted_assignments,
+    get_repository_heads,
+    set_offline,
+    set_index_fallback,
+    get_classroom_index,
+    prefetch_assignments,
+    prefetch_accepted_assignments,
+    clear_prefetched,
+    get_classroom_tree,
+    get_classrooms_async,
+    get_assignments_async,
+    get_accepted_assignments_async,
+    get_classroom_tree_async,
 )
 
 from .classroom_types import (
@@ -24,8 +36,14 @@ from .classroom_types import (
     AcceptedAssignment,
     Repository,
     Student,
+    AssignmentTree,
+    ClassroomTree,
 )
 
-from .gh import gh, gh_api
+from .gh import gh, gh_api, gh_api_raw, set_cache_mode, RateLimitError
+
+from .gh_cache import CacheMode
+
+from .ClassroomIndex import ClassroomIndex
 
 from .Roster import Roster
@@ -1,21 +1,117 @@
-from typing import overload
+from collections.abc import Iterable
+from concurrent.futures import Future
+from typing import Any, Callable, TypeVar, overload
+import asyncio
+import json
 import logging
+import threading
+import time
 
-from dacite import from_dict
 from rich.console import Console
 
 from .classroom_types import (
     Classroom,
     Assignment,
     AcceptedAssignment,
+    AssignmentTree,
+    ClassroomTree,
+    decode,
 )
 from au.common import draw_single_line, select_choice
-from au.common.datetime import get_friendly_local_datetime, utc_min
+from au.common.datetime import (
+    get_friendly_local_datetime,
+    get_friendly_timedelta,
+    utc_min,
+    utc_now,
+)
 
-from .gh import gh_api
+from .ClassroomIndex import ClassroomIndex
+from .gh import GitHubUnreachableError, gh_api_raw, gh_api_raw_or_unreachable
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+
+###############################################################################
+# Local classroom index (offline mode / fallback)
+###############################################################################
+
+_offline = False
+_index_fallback = True
+_index: ClassroomIndex | None = None
+_index_lock = threading.Lock()
+
+# Returned by _fetch when the data has to come from the index instead
+_USE_INDEX = object()
+
+
+def set_offline(offline: bool) -> None:
+    """
+    When offline, all get_* functions answer from the local classroom index
+    (see `au classroom sync`) without contacting GitHub.
+    """
+    global _offline
+    _offline = offline
+
+
+def set_index_fallback(enabled: bool) -> None:
+    """
+    Whether get_* functions answer from the local classroom index when GitHub
+    can't be reached (the default). `au classroom sync` turns this off so that
+    it never stores the index's own data back as fresh.
+    """
+    global _index_fallback
+    _index_fallback = enabled
+
+
+def get_classroom_index() -> ClassroomIndex | None:
+    global _index
+    with _index_lock:
+        if _index is None:
+            try:
+                _index = ClassroomIndex()
+            except Exception:
+                logger.debug("Unable to open the classroom index", exc_info=True)
+                return None
+        return _index
+
+
+def _fetch(endpoint: str) -> Any:
+    """
+    gh_api_raw(endpoint), or _USE_INDEX when offline or GitHub can't be
+    reached. A request GitHub refuses (e.g., 404 or an authentication error)
+    still returns None: answering from the index would hide the problem.
+    """
+    if _offline:
+        return _USE_INDEX
+    if not _index_fallback:
+        return gh_api_raw(endpoint)
+    try:
+        return gh_api_raw_or_unreachable(endpoint)
+    except GitHubUnreachableError as ex:
+        logger.warning(f"Unable to reach GitHub: {ex}")
+        return _USE_INDEX
+
+
+def _from_index(
+    what: str,
+    kind: str,
+    id: int | None,
+    loader: Callable[[ClassroomIndex], T],
+) -> T | None:
+    """Answer from the index, warning that the data is cached and how old it is."""
+    index = get_classroom_index()
+    synced_at = index.get_synced_at(kind, id) if index else None
+    if not synced_at:
+        logger.error(f"No local data for {what}. Run `au classroom sync` first.")
+        return None
+    age = get_friendly_timedelta(utc_now() - synced_at)
+    logger.warning(f"Using {what} from the local classroom index (synced {age} ago)")
+    return loader(index)
+
 
 ###############################################################################
 # get_classrooms / get_classroom / choose_classrooms
@@ -23,14 +119,27 @@ logger = logging.getLogger(__name__)
 
 
 def get_classrooms(include_archived=False) -> list[Classroom]:
+    return _get_classrooms(include_archived) or []
+
+
+def _get_classrooms(include_archived: bool = False) -> list[Classroom] | None:
+    """Like get_classrooms, but None if they couldn't be retrieved."""
     classrooms: list[Classroom] = []
 
-    rooms_d = gh_api("classrooms")
-    if not rooms_d:
-        return []
+    rooms_d = _fetch("classrooms")
+    if rooms_d is _USE_INDEX:
+        classrooms = _from_index(
+            "classrooms",
+            "classrooms",
+            None,
+            lambda index: index.get_classrooms(include_archived),
+        )
+        return classrooms or []
+    if rooms_d is None:
+        return None
     for room_d in rooms_d:
         try:
-            classroom = from_dict(Classroom, room_d)
+            classroom = decode(Classroom, room_d)
         except:
             logger.exception("Error converting Classroom")
             return None
@@ -41,11 +150,18 @@ def get_classrooms(include_archived=False) -> list[Classroom]:
 
 
 def get_classroom(classroom_id: int) -> Classroom | None:
-    room_d = gh_api(f"classrooms/{classroom_id}")
+    room_d = _fetch(f"classrooms/{classroom_id}")
+    if room_d is _USE_INDEX:
+        return _from_index(
+            f"classroom {classroom_id}",
+            "classrooms",
+            None,
+            lambda index: index.get_classroom(classroom_id),
+        )
     if not room_d:
         return None
     try:
-        classroom = from_dict(Classroom, room_d)
+        classroom = decode(Classroom, room_d)
     except:
         logger.exception("Error converting Classroom")
         return None
@@ -57,9 +173,13 @@ def choose_classroom(
     suppress_print: bool = False,
     title: str | None = "CHOOSE CLASSROOM",
     console: Console = Console(),
+    prefetch: bool = True,
 ) -> Classroom | None:
     classrooms = get_classrooms(include_archived=include_archived)
     classrooms.reverse()
+    if prefetch:
+        # Whatever gets picked, its assignments are likely to be needed next
+        prefetch_assignments(classrooms)
     choices = [c.name for c in classrooms]
     choice = select_choice(choices, title=title)
     if choice is not None:
@@ -86,7 +206,6 @@ def get_assignments(classroom: Classroom) -> list[Assignment]: ...
 
 
 def get_assignments(classroom: Classroom | int) -> list[Assignment]:
-    assignments: list[Assignment] = []
     if isinstance(classroom, Classroom):
         classroom_id = classroom.id
     elif isinstance(classroom, int):
@@ -94,14 +213,30 @@ def get_assignments(classroom: Classroom | int) -> list[Assignment]:
     else:
         raise ValueError("classroom must be either int or Classroom")
 
+    prefetched = _take_prefetched(("assignments", classroom_id))
+    if prefetched is not None:
+        return prefetched
+    return _get_assignments(classroom_id) or []
+
+
+def _get_assignments(classroom_id: int) -> list[Assignment] | None:
+    """Like get_assignments, but None if they couldn't be retrieved."""
     assignments: list[Assignment] = []
 
-    assignments_d = gh_api(f"classrooms/{classroom_id}/assignments")
-    if not assignments_d:
-        return []
+    assignments_d = _fetch(f"classrooms/{classroom_id}/assignments")
+    if assignments_d is _USE_INDEX:
+        assignments = _from_index(
+            f"assignments for classroom {classroom_id}",
+            "assignments",
+            classroom_id,
+            lambda index: index.get_assignments(classroom_id),
+        )
+        return assignments or []
+    if assignments_d is None:
+        return None
     for assn_d in assignments_d:
         try:
-            assignment = from_dict(Assignment, assn_d)
+            assignment = decode(Assignment, assn_d)
         except:
             logger.exception("Error converting Assignment")
             return None
@@ -158,11 +293,18 @@ def choose_assignment(
 
 
 def get_assignment(assignment_id: int = None) -> Assignment:
-    assn_d = gh_api(f"assignments/{assignment_id}")
+    assn_d = _fetch(f"assignments/{assignment_id}")
+    if assn_d is _USE_INDEX:
+        return _from_index(
+            f"assignment {assignment_id}",
+            "assignment",
+            assignment_id,
+            lambda index: index.get_assignment(assignment_id),
+        )
     if not assn_d:
         return None
     try:
-        assignment = from_dict(Assignment, assn_d)
+        assignment = decode(Assignment, assn_d)
     except:
         logger.exception("Error converting Assignment")
         return None
@@ -183,7 +325,6 @@ def get_accepted_assignments(assignment: Assignment) -> list[AcceptedAssignment]
 
 
 def get_accepted_assignments(assignment: Assignment | int) -> list[AcceptedAssignment]:
-    accepted_assignments: list[AcceptedAssignment] = []
     if isinstance(assignment, Assignment):
         assignment_id = assignment.id
     elif isinstance(assignment, int):
@@ -191,14 +332,30 @@ def get_accepted_assignments(assignment: Assignment | int) -> list[AcceptedAssig
     else:
         raise ValueError("assignment must be either int or Assignment")
 
+    prefetched = _take_prefetched(("accepted_assignments", assignment_id))
+    if prefetched is not None:
+        return prefetched
+    return _get_accepted_assignments(assignment_id) or []
+
+
+def _get_accepted_assignments(assignment_id: int) -> list[AcceptedAssignment] | None:
+    """Like get_accepted_assignments, but None if they couldn't be retrieved."""
     accepted_assignments: list[AcceptedAssignment] = []
 
-    accepted_assignments_d = gh_api(f"assignments/{assignment_id}/accepted_assignments")
-    if not accepted_assignments_d:
-        return []
+    accepted_assignments_d = _fetch(f"assignments/{assignment_id}/accepted_assignments")
+    if accepted_assignments_d is _USE_INDEX:
+        accepted_assignments = _from_index(
+            f"accepted assignments for assignment {assignment_id}",
+            "accepted",
+            assignment_id,
+            lambda index: index.get_accepted_assignments(assignment_id),
+        )
+        return accepted_assignments or []
+    if accepted_assignments_d is None:
+        return None
     for acc_assn_d in accepted_assignments_d:
         try:
-            accepted_assignment = from_dict(AcceptedAssignment, acc_assn_d)
+            accepted_assignment = decode(AcceptedAssignment, acc_assn_d)
         except:
             logger.exception("Error converting AcceptedAssignment")
             return None
@@ -206,6 +363,203 @@ def get_accepted_assignments(assignment: Assignment | int) -> list[AcceptedAssig
     return accepted_assignments
 
 
+###############################################################################
+# get_repository_heads
+###############################################################################
+
+MAX_GRAPHQL_NODES = 100  # GitHub's limit for nodes(ids:)
+
+_HEADS_QUERY = """
+query {
+  nodes(ids: %s) {
+    ... on Repository { id defaultBranchRef { target { oid } } }
+  }
+}
+"""
+
+
+def get_repository_heads(node_ids: Iterable[str]) -> dict[str, str]:
+    """
+    The SHA at the head of the default branch of each repository, keyed by
+    Repository.node_id, using one GraphQL query per 100 repositories.
+    Repositories that can't be resolved are left out of the result.
+    """
+    node_ids = list(dict.fromkeys(n for n in node_ids if n))
+    heads: dict[str, str] = {}
+    for start in range(0, len(node_ids), MAX_GRAPHQL_NODES):
+        batch = node_ids[start : start + MAX_GRAPHQL_NODES]
+        # IDs are inlined (as JSON string literals) because the `gh` fallback
+        # can't pass list variables
+        result = gh_api_raw(query=_HEADS_QUERY % json.dumps(batch))
+        nodes = ((result or {}).get("data") or {}).get("nodes") or []
+        for node in nodes:
+            try:
+                heads[node["id"]] = node["defaultBranchRef"]["target"]["oid"]
+            except (KeyError, TypeError):
+                continue
+    return heads
+
+
+###############################################################################
+# prefetch_assignments / prefetch_accepted_assignments
+###############################################################################
+
+MAX_PREFETCH_THREADS = 4
+
+# Seconds a prefetched result may be handed out; an older one may be stale
+PREFETCH_TTL = 120
+
+_prefetch_lock = threading.Lock()
+_prefetch_slots = threading.BoundedSemaphore(MAX_PREFETCH_THREADS)
+# {key: (future, time.monotonic() when started)}
+_prefetched: dict[tuple[str, int], tuple[Future, float]] = {}
+
+
+def _prefetch(key: tuple[str, int], func: Callable[[int], T]) -> None:
+    """
+    Start `func(key[1])` on a background thread. The result is handed to the
+    next get_* call for the same key, once, if it comes within PREFETCH_TTL.
+    Threads are daemons so a user cancelling out of a chooser never has to
+    wait for speculative requests to finish.
+    """
+    with _prefetch_lock:
+        now = time.monotonic()
+        for old_key, (old_future, started) in list(_prefetched.items()):
+            if now - started > PREFETCH_TTL:
+                old_future.cancel()
+                del _prefetched[old_key]
+        if key in _prefetched:
+            return
+        future = Future()
+        _prefetched[key] = (future, now)
+
+    def run():
+        with _prefetch_slots:
+            if not future.set_running_or_notify_cancel():
+                return
+            try:
+                future.set_result(func(key[1]))
+            except BaseException as ex:
+                future.set_exception(ex)
+
+    threading.Thread(target=run, name=f"au-prefetch-{key[0]}", daemon=True).start()
+
+
+def _take_prefetched(key: tuple[str, int]) -> Any | None:
+    with _prefetch_lock:
+        future, started = _prefetched.pop(key, (None, 0.0))
+    if future is None:
+        return None
+    if time.monotonic() - started > PREFETCH_TTL:
+        future.cancel()
+        return None
+    try:
+        return future.result()
+    except Exception:
+        logger.debug(f"Prefetch of {key} failed; retrying", exc_info=True)
+        return None
+
+
+def clear_prefetched() -> None:
+    """
+    Drop every prefetched result nobody took, cancelling those not started
+    yet. Called when the command that prefetched them ends.
+    """
+    with _prefetch_lock:
+        futures = [future for future, _ in _prefetched.values()]
+        _prefetched.clear()
+    for future in futures:
+        future.cancel()
+
+
+def prefetch_assignments(classrooms: Iterable[Classroom | int]) -> None:
+    """Start retrieving the assignments of each classroom in the background."""
+    for classroom in classrooms:
+        classroom_id = classroom.id if isinstance(classroom, Classroom) else classroom
+        _prefetch(("assignments", classroom_id), _get_assignments)
+
+
+def prefetch_accepted_assignments(assignment: Assignment | int) -> None:
+    """Start retrieving an assignment's accepted assignments in the background."""
+    assignment_id = assignment.id if isinstance(assignment, Assignment) else assignment
+    _prefetch(("accepted_assignments", assignment_id), _get_accepted_assignments)
+
+
+###############################################################################
+# async versions / get_classroom_tree
+###############################################################################
+
+
+async def _to_thread(
+    semaphore: asyncio.Semaphore | None, func: Callable[..., T], *args
+) -> T:
+    # The HTTP transport is synchronous (and thread safe), so the async API runs
+    # each call in a worker thread, bounded by the semaphore if one is given.
+    if semaphore is None:
+        return await asyncio.to_thread(func, *args)
+    async with semaphore:
+        return await asyncio.to_thread(func, *args)
+
+
+async def get_classrooms_async(
+    include_archived: bool = False, semaphore: asyncio.Semaphore | None = None
+) -> list[Classroom]:
+    return await _to_thread(semaphore, get_classrooms, include_archived)
+
+
+async def get_assignments_async(
+    classroom: Classroom | int, semaphore: asyncio.Semaphore | None = None
+) -> list[Assignment]:
+    return await _to_thread(semaphore, get_assignments, classroom)
+
+
+async def get_accepted_assignments_async(
+    assignment: Assignment | int, semaphore: asyncio.Semaphore | None = None
+) -> list[AcceptedAssignment]:
+    return await _to_thread(semaphore, get_accepted_assignments, assignment)
+
+
+async def get_classroom_tree_async(
+    include_archived: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> list[ClassroomTree] | None:
+    """
+    Retrieve every classroom with all of its assignments and their accepted
+    assignments. Requests for different classrooms and assignments run
+    concurrently, with at most `max_concurrency` in flight at once.
+
+    Unlike the get_* functions, failures aren't turned into empty lists: a
+    tree's assignments (or an assignment's accepted assignments) are None if
+    they couldn't be retrieved, and the result is None if the classrooms
+    couldn't be.
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def get_assignment_tree(assignment: Assignment) -> AssignmentTree:
+        accepted = await _to_thread(semaphore, _get_accepted_assignments, assignment.id)
+        return AssignmentTree(assignment=assignment, accepted_assignments=accepted)
+
+    async def get_tree(classroom: Classroom) -> ClassroomTree:
+        assignments = await _to_thread(semaphore, _get_assignments, classroom.id)
+        if assignments is None:
+            return ClassroomTree(classroom=classroom, assignments=None)
+        trees = await asyncio.gather(*(get_assignment_tree(a) for a in assignments))
+        return ClassroomTree(classroom=classroom, assignments=list(trees))
+
+    classrooms = await _to_thread(semaphore, _get_classrooms, include_archived)
+    if classrooms is None:
+        return None
+    return list(await asyncio.gather(*(get_tree(c) for c in classrooms)))
+
+
+def get_classroom_tree(
+    include_archived: bool = False,
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> list[ClassroomTree] | None:
+    """Synchronous wrapper around get_classroom_tree_async."""
+    return asyncio.run(get_classroom_tree_async(include_archived, max_concurrency))
+
+
 if __name__ == "__main__":
     c = choose_classroom()
     print(c)
@@ -1,7 +1,9 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, fields, is_dataclass, MISSING
 from datetime import datetime
+from types import NoneType, UnionType
+from typing import Any, Callable, TypeVar, Union, get_args, get_origin, get_type_hints
 import json
 from pprint import pformat
 
@@ -17,6 +19,100 @@ def _as_json(obj):
     return json.dumps(dct, default=github_json_serializer)
 
 
+###############################################################################
+# Schema-driven decoding
+###############################################################################
+
+T = TypeVar("T")
+
+_decoders: dict[type, Callable[[dict[str, Any]], Any]] = {}
+
+
+def _parse_datetime(value: Any) -> datetime | None:
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def _get_converter(type_: Any) -> Callable[[Any], Any] | None:
+    """
+    Build a converter for a field type, or None if raw JSON values can be used
+    as-is (the common case: ints, strs, bools).
+    """
+    origin = get_origin(type_)
+    if origin in (Union, UnionType):
+        args = [a for a in get_args(type_) if a is not NoneType]
+        if len(args) != 1:
+            return None
+        inner = _get_converter(args[0])
+        if inner is None:
+            return None
+        return lambda v: None if v is None else inner(v)
+    if origin is list:
+        (item_type,) = get_args(type_)
+        item = _get_converter(item_type)
+        if item is None:
+            return list
+        return lambda v: [item(i) for i in v]
+    if type_ is datetime:
+        return _parse_datetime
+    if is_dataclass(type_):
+        return get_decoder(type_)
+    return None
+
+
+def _is_optional(type_: Any) -> bool:
+    return get_origin(type_) in (Union, UnionType) and NoneType in get_args(type_)
+
+
+def get_decoder(cls: type[T]) -> Callable[[dict[str, Any]], T]:
+    """
+    Return a decoder that builds `cls` from a GitHub API dict in a single pass.
+    Decoders are generated once per dataclass from its type hints, so only the
+    fields typed as datetime are parsed as dates. Missing Optional fields
+    default to None; missing required fields raise ValueError.
+    """
+    decoder = _decoders.get(cls)
+    if decoder:
+        return decoder
+
+    hints = get_type_hints(cls)
+    # For each field: (name, converter, what to do when the key is missing)
+    plan: list[tuple[str, Callable[[Any], Any] | None, str]] = []
+    for f in fields(cls):
+        if f.default is not MISSING or f.default_factory is not MISSING:
+            missing = "default"
+        elif _is_optional(hints[f.name]):
+            missing = "none"
+        else:
+            missing = "error"
+        plan.append((f.name, None, missing))
+
+    def decode(data: dict[str, Any]) -> T:
+        kwargs = {}
+        for name, convert, missing in plan:
+            if name in data:
+                value = data[name]
+                kwargs[name] = convert(value) if convert else value
+            elif missing == "none":
+                kwargs[name] = None
+            elif missing == "error":
+                raise ValueError(f"Missing value for {cls.__name__}.{name}")
+        return cls(**kwargs)
+
+    # Register before resolving field converters so self-referencing types work
+    _decoders[cls] = decode
+    plan[:] = [
+        (name, _get_converter(hints[name]), missing) for name, _, missing in plan
+    ]
+    return decode
+
+
+def decode(cls: type[T], data: dict[str, Any]) -> T:
+    """Build a `cls` instance from a raw (undecoded) GitHub API dict."""
+    return get_decoder(cls)(data)
+
+
 @dataclass(kw_only=True)
 class Organization:
     id: int
@@ -196,3 +292,17 @@ class AcceptedAssignment:
 
     def __str__(self):
         return pformat(self)
+
+
+@dataclass(kw_only=True)
+class AssignmentTree:
+    assignment: Assignment
+    # None if they couldn't be retrieved
+    accepted_assignments: list[AcceptedAssignment] | None
+
+
+@dataclass(kw_only=True)
+class ClassroomTree:
+    classroom: Classroom
+    # None if they couldn't be retrieved
+    assignments: list[AssignmentTree] | None
@@ -1,12 +1,25 @@
-from typing import Any
+from dataclasses import dataclass
+from typing import Any, Callable
+import random
 import subprocess
 import json as json_module
 from pprint import pformat
 from datetime import date, datetime
 import logging
+import os
+import threading
+import time
 
 from au.common.datetime import date_to_local
 
+from .gh_cache import ResponseCache, CacheMode
+from .gh_http import (
+    GitHubHttpClient,
+    GitHubTransportError,
+    HttpResponse,
+    get_gh_token,
+)
+
 
 logger = logging.getLogger(__name__)
 
@@ -28,6 +41,10 @@ def github_json_deserializer(dct):
     return dct
 
 
+class GitHubUnreachableError(Exception):
+    """Raised when neither the HTTP client nor `gh` could connect to GitHub."""
+
+
 def gh(*args) -> subprocess.CompletedProcess:
     cmd = ["gh"]
     cmd.extend(args)
@@ -40,14 +57,363 @@ def gh_api(
     query: str | None = None,
     **kwargs,
 ) -> dict[str, Any] | None:
+    return _gh_api(endpoint, method, query, kwargs, github_json_deserializer)
+
+
+def gh_api_raw(
+    endpoint: str | None = None,
+    method: str | None = None,
+    query: str | None = None,
+    **kwargs,
+) -> Any:
+    """
+    Same as gh_api, but returns the JSON exactly as GitHub sent it, without
+    trying to convert every string value to a datetime. Use with
+    classroom_types.decode, which only parses fields typed as datetime.
+    """
+    return _gh_api(endpoint, method, query, kwargs, None)
+
+
+def gh_api_raw_or_unreachable(
+    endpoint: str | None = None,
+    method: str | None = None,
+    query: str | None = None,
+    **kwargs,
+) -> Any:
+    """
+    Same as gh_api_raw, but raises GitHubUnreachableError rather than
+    returning None if GitHub couldn't be reached at all, for callers with
+    somewhere else to get the data from. None still means GitHub refused the
+    request (e.g., 404 or an authentication error).
+    """
+    return _gh_api(endpoint, method, query, kwargs, None, raise_unreachable=True)
+
+
+def _gh_api(
+    endpoint: str | None,
+    method: str | None,
+    query: str | None,
+    fields: dict[str, Any],
+    object_hook: Callable[[dict], Any] | None,
+    raise_unreachable: bool = False,
+) -> Any:
     if query and endpoint and endpoint != "graphql":
         raise ValueError("If query is provided, the endpoint must be 'graphql'")
     elif query:
         endpoint = "graphql"
-    cmd = ["gh", "api", endpoint, "--paginate"]
+    client = get_http_client()
+    transport_error = None
+    if client:
+        try:
+            return _http_api(client, endpoint, method, query, fields, object_hook)
+        except GitHubTransportError as ex:
+            transport_error = ex
+            logger.warning("GitHub API request failed; falling back to `gh` command")
+    try:
+        result = _gh_cli_api(endpoint, method, query, fields, object_hook)
+    except GitHubUnreachableError:
+        if raise_unreachable:
+            raise
+        return None
+    if result is None and transport_error and raise_unreachable:
+        raise GitHubUnreachableError(str(transport_error))
+    return result
+
+
+###############################################################################
+# Rate limit scheduling
+###############################################################################
+
+
+class RateLimitError(Exception):
+    """
+    Raised when GitHub keeps refusing requests because of a rate limit. Unlike
+    other failures this is not swallowed by gh_api, since returning None would
+    leave callers quietly working from partial data. The command line reports
+    it as an error (see AliasedGroup).
+
+    resource is the rate limit resource (core, graphql, ...) and reset the
+    time (epoch seconds) it is expected to accept requests again, if known.
+    """
+
+    def __init__(
+        self, message: str, resource: str | None = None, reset: float | None = None
+    ):
+        super().__init__(message)
+        self.resource = resource
+        self.reset = reset
+
+    def __str__(self) -> str:
+        details = []
+        if self.resource:
+            details.append(f"resource: {self.resource}")
+        if self.reset:
+            reset = time.strftime("%H:%M:%S", time.localtime(self.reset))
+            details.append(f"resets at {reset}")
+        message = super().__str__()
+        return f"{message} ({', '.join(details)})" if details else message
+
+
+@dataclass
+class RateLimitBudget:
+    limit: int | None = None
+    remaining: int | None = None
+    reset: float | None = None  # epoch seconds
+    # While pacing, the time slot the next request for this resource gets
+    next_slot: float = 0.0
+    # GitHub asked (with Retry-After) for no requests before this time
+    blocked_until: float = 0.0
+
+
+class RateLimitScheduler:
+    """
+    Central pacing for every GitHub API request made by this process.
+
+    Budgets are tracked per rate limit resource (core, graphql, ...) from the
+    X-RateLimit-* response headers. Once the remaining budget drops below
+    `reserve`, requests are spread over the time left until the reset instead
+    of running the budget dry. 403 / 429 responses caused by primary or
+    secondary rate limits are retried with jittered exponential backoff (or
+    after Retry-After / the reset time when GitHub provides one).
+
+    Budgets (and a Retry-After pause) are shared by every thread using the
+    resource, but backoff is computed per request: only the thread whose
+    request was refused sleeps before retrying it.
+    """
+
+    def __init__(
+        self,
+        reserve: int = 100,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_wait: float = 300.0,
+    ):
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_wait = max_wait
+        self._budgets: dict[str, RateLimitBudget] = {}
+        self._lock = threading.Lock()
+
+    def get_budget(self, resource: str = "core") -> RateLimitBudget:
+        with self._lock:
+            return self._budgets.setdefault(resource, RateLimitBudget())
+
+    def execute(self, send: Callable[[], HttpResponse], resource: str) -> HttpResponse:
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_budget(resource)
+            resp = send()
+            self._update_budget(resource, resp)
+            if not self._is_rate_limited(resp):
+                return resp
+            if attempt == self.max_retries:
+                break
+            delay = self._get_retry_delay(resp, attempt)
+            if delay > self.max_wait:
+                raise RateLimitError(
+                    f"GitHub API rate limit exceeded; retry after {delay:.0f} seconds",
+                    resp.header("x-ratelimit-resource", resource),
+                    time.time() + delay,
+                )
+            logger.warning(
+                f"GitHub API rate limited ({resp.status}); retrying in {delay:.1f}s"
+            )
+            if resp.header("retry-after"):
+                # GitHub's pause applies to every request, not just this one
+                with self._lock:
+                    budget = self._budgets.setdefault(resource, RateLimitBudget())
+                    budget.blocked_until = max(
+                        budget.blocked_until, time.time() + delay
+                    )
+            else:
+                # An exhausted budget already holds back the other threads
+                # (see _wait_for_budget); the backoff is this request's alone
+                time.sleep(delay)
+        raise RateLimitError(
+            f"GitHub API rate limit exceeded after {self.max_retries} retries",
+            resource,
+            self.get_budget(resource).reset,
+        )
+
+    def _wait_for_budget(self, resource: str) -> None:
+        with self._lock:
+            now = time.time()
+            budget = self._budgets.setdefault(resource, RateLimitBudget())
+            delay = max(0.0, budget.blocked_until - now)
+            if budget.remaining is not None and budget.reset:
+                until_reset = max(0.0, budget.reset - now)
+                if budget.remaining <= 0:
+                    delay = max(delay, until_reset)
+                elif budget.remaining < self.reserve:
+                    # Spread what's left evenly over the rest of the window by
+                    # handing each request its own time slot
+                    interval = until_reset / budget.remaining
+                    slot = max(now, budget.next_slot)
+                    budget.next_slot = slot + interval
+                    delay = max(delay, slot - now)
+                # Count in-flight requests against the budget right away
+                budget.remaining -= 1
+        if delay > self.max_wait:
+            raise RateLimitError(
+                f"GitHub API {resource} budget exhausted; resets in {delay:.0f}s",
+                resource,
+                time.time() + delay,
+            )
+        if delay >= 1:
+            logger.info(f"Pacing GitHub API requests: waiting {delay:.1f}s")
+        if delay > 0:
+            time.sleep(delay)
+
+    def _update_budget(self, resource: str, resp: HttpResponse) -> None:
+        resource = resp.header("x-ratelimit-resource", resource)
+        try:
+            limit = int(resp.header("x-ratelimit-limit"))
+            remaining = int(resp.header("x-ratelimit-remaining"))
+            reset = float(resp.header("x-ratelimit-reset"))
+        except (TypeError, ValueError):
+            return  # e.g., served from the cache
+        with self._lock:
+            budget = self._budgets.setdefault(resource, RateLimitBudget())
+            budget.limit = limit
+            budget.remaining = remaining
+            budget.reset = reset
+        logger.debug(
+            f"GitHub API {resource} budget: {remaining}/{limit} remaining, "
+            f"resets at {time.strftime('%H:%M:%S', time.localtime(reset))}"
+        )
+
+    @staticmethod
+    def _is_rate_limited(resp: HttpResponse) -> bool:
+        if resp.status == 429:
+            return True
+        if resp.status != 403:
+            return False
+        if resp.header("retry-after") or resp.header("x-ratelimit-remaining") == "0":
+            return True
+        return b"rate limit" in resp.body.lower()
+
+    def _get_retry_delay(self, resp: HttpResponse, attempt: int) -> float:
+        retry_after = resp.header("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+        if resp.header("x-ratelimit-remaining") == "0":
+            try:
+                return max(0.0, float(resp.header("x-ratelimit-reset")) - time.time())
+            except (TypeError, ValueError):
+                pass
+        # Full jitter keeps concurrent workers from retrying in lockstep
+        return random.uniform(0, self.base_delay * 2**attempt) + self.base_delay
+
+
+###############################################################################
+# HTTP transport
+###############################################################################
+
+TRANSPORT_ENV = "AU_GH_TRANSPORT"  # set to "cli" to always use the `gh` command
+
+_client_lock = threading.Lock()
+_client: GitHubHttpClient | None = None
+_client_loaded = False
+_cache = ResponseCache()
+_scheduler = RateLimitScheduler()
+
+
+def set_cache_mode(mode: CacheMode) -> None:
+    """Set how GET responses use the on-disk cache (e.g., from --no-cache)."""
+    _cache.mode = mode
+
+
+def get_http_client() -> GitHubHttpClient | None:
+    """
+    Return the shared pooled HTTP client, or None if no token is available (in
+    which case callers fall back to the `gh` command).
+    """
+    global _client, _client_loaded
+    with _client_lock:
+        if not _client_loaded:
+            _client_loaded = True
+            if os.environ.get(TRANSPORT_ENV, "").lower() != "cli":
+                token = get_gh_token()
+                if token:
+                    _client = GitHubHttpClient(
+                        token, cache=_cache, scheduler=_scheduler
+                    )
+                else:
+                    logger.debug("No GitHub token found; using `gh` command")
+        return _client
+
+
+def set_http_client(client: GitHubHttpClient | None) -> None:
+    """Replace the shared client (e.g., to point at a local stand-in server)."""
+    global _client, _client_loaded
+    with _client_lock:
+        if _client and _client is not client:
+            _client.close()
+        _client = client
+        _client_loaded = True
+
+
+def _http_api(
+    client: GitHubHttpClient,
+    endpoint: str,
+    method: str | None,
+    query: str | None,
+    fields: dict[str, Any],
+    object_hook: Callable[[dict], Any] | None = github_json_deserializer,
+) -> Any:
+    # Same defaults as `gh api`: POST if any parameters were added, else GET
+    method = (method or ("POST" if fields or query else "GET")).upper()
+    if query:
+        responses = [
+            client.request(method, endpoint, body={"query": query, "variables": fields})
+        ]
+    elif method == "GET":
+        responses = client.paginate(endpoint, fields)
+    else:
+        responses = [client.request(method, endpoint, body=fields)]
+
+    for resp in responses:
+        if resp.status == 404:
+            logger.error(f"Invalid GitHub API Endpoint: {endpoint}")
+            return None
+        if not resp.ok:
+            logger.info(f"No result returned for gh_api({endpoint}): {resp.status}")
+            return None
+    try:
+        pages = [resp.json(object_hook=object_hook) for resp in responses]
+    except json_module.JSONDecodeError:
+        logger.exception(f"Invalid JSON returned from {endpoint}")
+        return None
+    json = pages[0]
+    if isinstance(json, list):
+        for page in pages[1:]:
+            json.extend(page)
+    logger.debug(f"Retrieved JSON: {pformat(json)}")
+    return json
+
+
+###############################################################################
+# gh command fallback
+###############################################################################
+
+
+def _gh_cli_api(
+    endpoint: str,
+    method: str | None,
+    query: str | None,
+    fields: dict[str, Any],
+    object_hook: Callable[[dict], Any] | None = github_json_deserializer,
+) -> Any:
+    cmd = ["gh", "api", endpoint]
+    # gh api sends a POST when given fields and no method; only GETs page
+    if (method or ("POST" if fields or query else "GET")).upper() == "GET":
+        cmd.append("--paginate")
     if method:
         cmd.extend(["--method", method])
-    for k, v in kwargs.values():
+    for k, v in fields.items():
         if isinstance(v, bool):
             val = "true" if v else "false"
             cmd.extend(["-F", f"{k}={val}"])
@@ -56,17 +422,22 @@ def gh_api(
         else:
             cmd.extend(["-f", f"{k}={str(v)}"])
     if query:
-        cmd.extend(["-f", "query='{query}'"])
+        cmd.extend(["-f", f"query={query}"])
     try:
         result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-        json = json_module.loads(result.stdout, object_hook=github_json_deserializer)
+        json = json_module.loads(result.stdout, object_hook=object_hook)
         if isinstance(json, dict):
             if json.get("message", "").upper() == "NOT FOUND":
                 logger.error(f"Invalid GitHub API Endpoint: {endpoint}")
                 return None
         logger.debug(f"Retrieved JSON: {pformat(json)}")
         return json
-    except subprocess.CalledProcessError:
+    except subprocess.CalledProcessError as ex:
+        if "rate limit" in (ex.stderr or "").lower():
+            raise RateLimitError(ex.stderr.strip()) from ex
+        if "error connecting" in (ex.stderr or "").lower():
+            logger.info(f"Unable to connect to GitHub for gh_api({endpoint})")
+            raise GitHubUnreachableError(ex.stderr.strip()) from ex
         logger.info(f"No result returned for gh_api({endpoint})")
         return None
     except FileNotFoundError:
@@ -0,0 +1,182 @@
+from dataclasses import dataclass, asdict
+from enum import Enum
+from pathlib import Path
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_DIR_ENV = "AU_CACHE_DIR"
+DEFAULT_MAX_BYTES = 50 * 1024 * 1024
+# Eviction shrinks the cache to this fraction of max_bytes, so that it isn't
+# needed again for the next few writes
+EVICT_TO = 0.8
+
+# Seconds a cached response is served without contacting GitHub at all. Once
+# expired, the entry is revalidated with a conditional request, which costs
+# nothing against the rate limit when GitHub answers 304 Not Modified.
+# Endpoints that don't match any pattern are always revalidated.
+DEFAULT_TTLS: list[tuple[re.Pattern, int]] = [
+    (re.compile(r"^classrooms$"), 60 * 60),
+    (re.compile(r"^classrooms/\d+$"), 24 * 60 * 60),
+    (re.compile(r"^classrooms/\d+/assignments$"), 10 * 60),
+    (re.compile(r"^assignments/\d+$"), 10 * 60),
+    (re.compile(r"^assignments/\d+/accepted_assignments$"), 0),
+]
+
+
+class CacheMode(Enum):
+    DEFAULT = "default"  # serve fresh entries, revalidate stale ones
+    REFRESH = "refresh"  # always revalidate, even if the TTL has not expired
+    DISABLED = "disabled"  # neither read from nor write to the cache
+
+
+def get_default_cache_dir() -> Path:
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "au" / "gh"
+
+
+@dataclass
+class CacheEntry:
+    key: str
+    fetched_at: float
+    body: str
+    etag: str | None = None
+    last_modified: str | None = None
+    link: str | None = None
+
+    def age(self) -> float:
+        return time.time() - self.fetched_at
+
+
+class ResponseCache:
+    """
+    On-disk cache of GitHub API GET responses keyed by endpoint. Entries are
+    stored one per file and evicted least-recently-used first once the cache
+    grows past `max_bytes`.
+
+    The cache directory is only scanned by the first write and whenever the
+    bytes written since could have taken it past `max_bytes`, not on every
+    write.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path | None = None,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        ttls: list[tuple[re.Pattern, int]] | None = None,
+    ):
+        self.cache_dir = cache_dir or get_default_cache_dir()
+        self.max_bytes = max_bytes
+        self.ttls = DEFAULT_TTLS if ttls is None else ttls
+        self.mode = CacheMode.DEFAULT
+        self._lock = threading.Lock()
+        # Size of the cache as of the last scan plus everything written since
+        # (an overestimate, as overwritten entries are counted twice); None
+        # until the first write scans the directory
+        self._total_bytes: int | None = None
+
+    @staticmethod
+    def make_key(*parts: str) -> str:
+        return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get_ttl(self, endpoint: str) -> int:
+        endpoint = endpoint.strip("/").split("?")[0]
+        for pattern, ttl in self.ttls:
+            if pattern.match(endpoint):
+                return ttl
+        return 0
+
+    def is_fresh(self, entry: CacheEntry, endpoint: str) -> bool:
+        if self.mode is not CacheMode.DEFAULT:
+            return False
+        return entry.age() < self.get_ttl(endpoint)
+
+    def get(self, key: str) -> CacheEntry | None:
+        if self.mode is CacheMode.DISABLED:
+            return None
+        file = self._file(key)
+        try:
+            with open(file, "r") as fi:
+                entry = CacheEntry(**json.load(fi))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logger.debug(f"Discarding unreadable cache entry {file}")
+            file.unlink(missing_ok=True)
+            return None
+        try:
+            os.utime(file)  # mtime doubles as the LRU access time
+        except OSError:
+            pass
+        return entry
+
+    def put(self, entry: CacheEntry) -> None:
+        if self.mode is CacheMode.DISABLED:
+            return
+        data = json.dumps(asdict(entry))
+        tmp_file = None
+        try:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                "w", dir=self.cache_dir, suffix=".tmp", delete=False
+            ) as fo:
+                tmp_file = fo.name
+                fo.write(data)
+            os.replace(tmp_file, self._file(entry.key))
+        except OSError:
+            logger.debug("Unable to write to the GitHub API cache", exc_info=True)
+            if tmp_file:
+                Path(tmp_file).unlink(missing_ok=True)
+            return
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data)
+                if self._total_bytes <= self.max_bytes:
+                    return
+        self.evict()
+
+    def touch(self, entry: CacheEntry) -> None:
+        """Mark an entry as just revalidated (after a 304)."""
+        entry.fetched_at = time.time()
+        self.put(entry)
+
+    def evict(self) -> None:
+        """
+        If the cache is over max_bytes, remove least recently used entries
+        until it is down to EVICT_TO of that.
+        """
+        with self._lock:
+            try:
+                files = [(f, f.stat()) for f in self.cache_dir.glob("*.json")]
+            except OSError:
+                return
+            total = sum(st.st_size for _, st in files)
+            if total > self.max_bytes:
+                files.sort(key=lambda f: f[1].st_mtime)
+                for file, st in files:
+                    if total <= self.max_bytes * EVICT_TO:
+                        break
+                    file.unlink(missing_ok=True)
+                    total -= st.st_size
+                    logger.debug(f"Evicted {file.name} from the GitHub API cache")
+            self._total_bytes = total
+
+    def clear(self) -> None:
+        with self._lock:
+            for file in self.cache_dir.glob("*.json"):
+                file.unlink(missing_ok=True)
+            self._total_bytes = 0
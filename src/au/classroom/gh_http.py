@@ -0,0 +1,391 @@
+from dataclasses import dataclass, field
+from collections import deque
+from typing import Any, Callable, Protocol
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, urlencode, parse_qs
+import hashlib
+import http.client
+import json as json_module
+import logging
+import os
+import re
+import subprocess
+import threading
+import time
+
+from .gh_cache import ResponseCache, CacheEntry
+
+
+logger = logging.getLogger(__name__)
+
+
+DEFAULT_API_URL = "https://api.github.com"
+API_URL_ENV = "AU_GITHUB_API_URL"  # override for GHES or a local stand-in server
+TOKEN_ENVS = ("GH_TOKEN", "GITHUB_TOKEN")
+
+_DEFAULT_HEADERS = {
+    "Accept": "application/vnd.github+json",
+    "X-GitHub-Api-Version": "2022-11-28",
+    "User-Agent": "au-tools",
+}
+
+# Methods that are safe to send again if the response was lost
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "DELETE"})
+
+PER_PAGE = 100  # the maximum GitHub allows; fewer pages means fewer round trips
+MAX_PAGE_WORKERS = 4
+
+_link_pattern = re.compile(r'<([^>]+)>\s*;\s*rel="([^"]+)"')
+
+
+class GitHubTransportError(Exception):
+    """Raised when the HTTP transport itself fails (not for HTTP error codes)."""
+
+
+class RequestScheduler(Protocol):
+    def execute(
+        self, send: Callable[[], "HttpResponse"], resource: str
+    ) -> "HttpResponse": ...
+
+
+###############################################################################
+# Token
+###############################################################################
+
+
+_token_lock = threading.Lock()
+_token: str | None = None
+_token_loaded = False
+
+
+def get_gh_token() -> str | None:
+    """
+    Return the token `gh auth` already stores (or GH_TOKEN / GITHUB_TOKEN if
+    set). The `gh auth token` call is only made once per process.
+    """
+    global _token, _token_loaded
+    with _token_lock:
+        if _token_loaded:
+            return _token
+        _token_loaded = True
+        for env in TOKEN_ENVS:
+            if os.environ.get(env):
+                _token = os.environ[env]
+                return _token
+        try:
+            result = subprocess.run(
+                ["gh", "auth", "token"], capture_output=True, text=True, check=True
+            )
+            _token = result.stdout.strip() or None
+        except (subprocess.CalledProcessError, FileNotFoundError):
+            logger.debug("Unable to retrieve token from `gh auth token`")
+            _token = None
+        return _token
+
+
+###############################################################################
+# HttpResponse
+###############################################################################
+
+
+@dataclass
+class HttpResponse:
+    status: int
+    headers: dict[str, str] = field(default_factory=dict)
+    body: bytes = b""
+
+    def header(self, name: str, default: str | None = None) -> str | None:
+        return self.headers.get(name.lower(), default)
+
+    def links(self) -> dict[str, str]:
+        """Parse the RFC 5988 Link header into a {rel: url} dict."""
+        link = self.header("link")
+        if not link:
+            return {}
+        return {rel: url for url, rel in _link_pattern.findall(link)}
+
+    def json(self, object_hook=None) -> Any:
+        if not self.body:
+            return None
+        return json_module.loads(self.body, object_hook=object_hook)
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+
+###############################################################################
+# ConnectionPool
+###############################################################################
+
+
+class ConnectionPool:
+    """
+    A small thread-safe pool of keep-alive connections to a single host. Idle
+    connections are reused LIFO so the most recently used (and least likely to
+    have been closed by the server) is handed out first.
+    """
+
+    def __init__(
+        self, scheme: str, host: str, port: int | None, maxsize: int, timeout: float
+    ):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle: deque[http.client.HTTPConnection] = deque()
+        self._lock = threading.Lock()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(
+                self.host, self.port, timeout=self.timeout
+            )
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def get(self) -> tuple[http.client.HTTPConnection, bool]:
+        """Returns a connection and whether it is being reused."""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop(), True
+        return self._new_connection(), False
+
+    def put(self, conn: http.client.HTTPConnection) -> None:
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close(self) -> None:
+        with self._lock:
+            while self._idle:
+                self._idle.pop().close()
+
+
+###############################################################################
+# GitHubHttpClient
+###############################################################################
+
+
+class GitHubHttpClient:
+    """
+    In-process replacement for `gh api` that keeps TLS connections alive
+    between calls instead of spawning a `gh` process for every request.
+    """
+
+    def __init__(
+        self,
+        token: str | None,
+        base_url: str | None = None,
+        pool_size: int = 8,
+        timeout: float = 30,
+        cache: ResponseCache | None = None,
+        max_page_workers: int = MAX_PAGE_WORKERS,
+        scheduler: RequestScheduler | None = None,
+    ):
+        base_url = base_url or os.environ.get(API_URL_ENV) or DEFAULT_API_URL
+        parts = urlsplit(base_url)
+        if parts.scheme not in ("http", "https"):
+            raise ValueError(f"Unsupported API URL: {base_url}")
+        self.base_url = base_url.rstrip("/")
+        self._base_parts = parts
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.base_path = parts.path.rstrip("/")
+        self.token = token
+        self.cache = cache
+        self.max_page_workers = max_page_workers
+        self.scheduler = scheduler
+        self.pool = ConnectionPool(
+            parts.scheme, parts.hostname, parts.port, pool_size, timeout
+        )
+
+    def _path_for(self, endpoint: str, params: dict[str, Any] | None = None) -> str:
+        if endpoint.startswith(("http://", "https://")):
+            # Absolute URLs come from Link headers; they must point at our API
+            parts = urlsplit(endpoint)
+            if (
+                parts.scheme.lower() != self._base_parts.scheme.lower()
+                or parts.netloc.lower() != self._base_parts.netloc.lower()
+                or not f"{parts.path}/".startswith(f"{self.base_path}/")
+            ):
+                raise ValueError(f"Refusing to follow foreign URL: {endpoint}")
+            path = f"{parts.path}?{parts.query}" if parts.query else parts.path
+        else:
+            path = f"{self.base_path}/{endpoint.lstrip('/')}"
+        if params:
+            sep = "&" if "?" in path else "?"
+            path += sep + urlencode(params)
+        return path
+
+    def request(
+        self,
+        method: str,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+        body: Any = None,
+        headers: dict[str, str] | None = None,
+    ) -> HttpResponse:
+        path = self._path_for(endpoint, params)
+        req_headers = dict(_DEFAULT_HEADERS)
+        if self.token:
+            req_headers["Authorization"] = f"Bearer {self.token}"
+        data = None
+        if body is not None:
+            data = json_module.dumps(body).encode()
+            req_headers["Content-Type"] = "application/json"
+        if headers:
+            req_headers.update(headers)
+
+        def send() -> HttpResponse:
+            return self._send(method, path, data, req_headers)
+
+        if self.scheduler:
+            resource = "graphql" if path.endswith("/graphql") else "core"
+            return self.scheduler.execute(send, resource)
+        return send()
+
+    def _send(
+        self, method: str, path: str, data: bytes | None, headers: dict[str, str]
+    ) -> HttpResponse:
+        # A pooled connection may have been closed by the server while idle.
+        # In that case retry exactly once on a fresh connection, unless the
+        # request was sent and repeating it could apply it twice.
+        for _ in range(2):
+            conn, reused = self.pool.get()
+            sent = False
+            try:
+                conn.request(method, path, body=data, headers=headers)
+                sent = True
+                resp = conn.getresponse()
+                payload = resp.read()
+            except (http.client.HTTPException, OSError) as ex:
+                conn.close()
+                if reused and (not sent or method.upper() in _IDEMPOTENT_METHODS):
+                    logger.debug(f"Stale pooled connection, retrying: {ex}")
+                    continue
+                raise GitHubTransportError(f"{method} {path} failed: {ex}") from ex
+            if resp.will_close:
+                conn.close()
+            else:
+                self.pool.put(conn)
+            return HttpResponse(
+                resp.status, {k.lower(): v for k, v in resp.getheaders()}, payload
+            )
+        raise GitHubTransportError(f"{method} {path} failed")
+
+    def get(
+        self, endpoint: str, params: dict[str, Any] | None = None
+    ) -> HttpResponse:
+        """
+        GET with the response cache: fresh entries are returned without any
+        request; stale ones are revalidated with If-None-Match /
+        If-Modified-Since so an unchanged resource costs only a 304.
+        """
+        if not self.cache:
+            return self.request("GET", endpoint, params)
+
+        path = self._path_for(endpoint, params)
+        relative = path[len(self.base_path) :]
+        key = ResponseCache.make_key(self.base_url, self._token_id(), path)
+        entry = self.cache.get(key)
+        if entry and self.cache.is_fresh(entry, relative):
+            logger.debug(f"Cache hit for {relative}")
+            return self._from_entry(entry)
+
+        headers = {}
+        if entry and entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry and entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        resp = self.request("GET", self.origin + path, headers=headers)
+        if resp.status == 304 and entry:
+            logger.debug(f"Cache revalidated for {relative}")
+            self.cache.touch(entry)
+            cached = self._from_entry(entry)
+            cached.headers.update(
+                {k: v for k, v in resp.headers.items() if k.startswith("x-ratelimit")}
+            )
+            return cached
+        if resp.ok and (resp.header("etag") or resp.header("last-modified")):
+            self.cache.put(
+                CacheEntry(
+                    key=key,
+                    fetched_at=time.time(),
+                    body=resp.body.decode(),
+                    etag=resp.header("etag"),
+                    last_modified=resp.header("last-modified"),
+                    link=resp.header("link"),
+                )
+            )
+        return resp
+
+    def _token_id(self) -> str:
+        # Never share cached responses between accounts
+        return hashlib.sha256((self.token or "").encode()).hexdigest()[:16]
+
+    @staticmethod
+    def _from_entry(entry: CacheEntry) -> HttpResponse:
+        headers = {"link": entry.link} if entry.link else {}
+        return HttpResponse(200, headers, entry.body.encode())
+
+    def paginate(
+        self,
+        endpoint: str,
+        params: dict[str, Any] | None = None,
+    ) -> list[HttpResponse]:
+        """
+        GET every page of a list endpoint. When the first response advertises a
+        rel="last" page number, the remaining pages are fetched concurrently
+        (at most `max_page_workers` at a time) and returned in page order.
+        Otherwise rel="next" links are followed one after another.
+        """
+        params = dict(params or {})
+        params.setdefault("per_page", PER_PAGE)
+        first = self.get(endpoint, params)
+        if not first.ok:
+            return [first]
+
+        page_urls = self._get_page_urls(first)
+        if page_urls is not None:
+            if not page_urls:
+                return [first]
+            workers = min(self.max_page_workers, len(page_urls))
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return [first] + list(executor.map(self.get, page_urls))
+
+        responses = [first]
+        while responses[-1].ok:
+            next_url = responses[-1].links().get("next")
+            if not next_url:
+                break
+            responses.append(self.get(next_url))
+        return responses
+
+    @staticmethod
+    def _get_page_urls(first: HttpResponse) -> list[str] | None:
+        """
+        URLs for pages 2..last based on the rel="last" link, or None if the
+        endpoint doesn't use numbered pages.
+        """
+        links = first.links()
+        if "next" not in links:
+            return []
+        last = links.get("last")
+        if not last:
+            return None
+        parts = urlsplit(last)
+        query = parse_qs(parts.query)
+        try:
+            last_page = int(query["page"][0])
+        except (KeyError, ValueError):
+            return None
+        urls = []
+        for page in range(2, last_page + 1):
+            query["page"] = [str(page)]
+            urls.append(parts._replace(query=urlencode(query, doseq=True)).geturl())
+        return urls
+
+    def close(self) -> None:
+        self.pool.close()
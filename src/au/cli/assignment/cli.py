@@ -4,7 +4,13 @@ from rich.console import Console
 from craftable import get_table
 from craftable.styles import BasicScreenStyle
 
-from au.click import AliasedGroup, AssignmentOptions, RosterOptions, BasePath
+from au.click import (
+    AliasedGroup,
+    AssignmentOptions,
+    CacheOptions,
+    RosterOptions,
+    BasePath,
+)
 from au.classroom import (
     Roster,
     get_accepted_assignments,
@@ -14,6 +20,7 @@ from .settings import settings_cmd
 from .rename_roster import rename_roster
 from .commit_all import commit_all
 from .clone_all import clone_all_cmd
+from .publish_feedback import publish_feedback
 from .time_details import time_details
 
 
@@ -26,9 +33,11 @@ assignment.add_command(settings_cmd)
 assignment.add_command(rename_roster)
 assignment.add_command(commit_all)
 assignment.add_command(clone_all_cmd)
+assignment.add_command(publish_feedback)
 assignment.add_command(time_details)
 
 @assignment.command()
+@CacheOptions().options
 @AssignmentOptions(required=True, store=False).options
 def info(assignment):
     """Display details for an assignment.
@@ -44,7 +53,8 @@ def info(assignment):
 
 
 @assignment.command()
-@AssignmentOptions(required=True, store=False).options
+@CacheOptions().options
+@AssignmentOptions(required=True, store=False, prefetch_accepted=True).options
 @RosterOptions(required=False, load=False, store=False, prompt=True).options
 def accepted(assignment, roster: Roster):
     """List all students that have accepted an  assignment."""
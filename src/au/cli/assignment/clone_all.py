@@ -1,4 +1,6 @@
+import functools
 import logging
+import shutil
 import sys
 from pathlib import Path
 from pprint import pformat
@@ -10,17 +12,56 @@ from craftable import get_table
 from craftable.styles import BasicScreenStyle
 from git_wrap import GitRepo, get_git_dirs
 
-from au.classroom import Assignment, Roster, get_accepted_assignments
-from au.click import BasePath, AssignmentOptions, RosterOptions, DebugOptions
+from au.classroom import (
+    AcceptedAssignment,
+    Assignment,
+    Roster,
+    get_accepted_assignments,
+    get_repository_heads,
+)
+from au.click import (
+    BasePath,
+    AssignmentOptions,
+    CacheOptions,
+    JobsOptions,
+    RosterOptions,
+    DebugOptions,
+)
 from au.common import draw_double_line, draw_single_line
+from au.common.git_tools import (
+    DEADLINE_BRANCH,
+    SPARSE_PROFILES,
+    add_worktree,
+    checkout_branch_at,
+    clone,
+    contains_commit,
+    get_commit_at,
+    get_current_branch,
+    get_remote_head_sha,
+    get_sparse_patterns,
+    get_upstream_sha,
+    update_mirror,
+)
+from au.common.journal import Journal
+from au.common.parallel import JobResult, run_jobs
+from au.common.state import get_state_dir, load_state, save_state
+from au.common.worktree_index import record_clean
+
+from .publish_feedback import release_published_files
 
 
 logger = logging.getLogger(__name__)
 
+SYNC_STATE_FILE = "sync_state.json"
+STARTER_MIRROR_DIR = "starter.git"
+JOURNAL_FILE = "clone_all_journal.json"
+DEADLINE_STATE_FILE = "deadline_shas.json"
+
 
 @click.command("clone-all")
 @click.argument("root_dir", type=BasePath(), default=".")
-@AssignmentOptions(required=True, force_store=True).options
+@CacheOptions().options
+@AssignmentOptions(required=True, force_store=True, prefetch_accepted=True).options
 @RosterOptions(prompt=True, force_store=True).options
 @click.option(
     "--preserve-prefix",
@@ -33,6 +74,12 @@ logger = logging.getLogger(__name__)
     is_flag=True,
     help="set to pull changes to existing repositories",
 )
+@click.option(
+    "--check-all",
+    is_flag=True,
+    help="set to contact GitHub for every existing repository when updating, "
+    "even those whose commit count is unchanged since the last sync",
+)
 @click.option(
     "-y",
     "--skip-confirm",
@@ -45,6 +92,45 @@ logger = logging.getLogger(__name__)
     is_flag=True,
     help="set to show changes without actually making them",
 )
+@click.option(
+    "--filter",
+    "clone_filter",
+    help="partial clone filter passed to git clone (e.g. blob:none) so file "
+    "contents are only downloaded when needed",
+)
+@click.option(
+    "--depth",
+    type=click.IntRange(min=1),
+    help="create shallow clones with only the latest DEPTH commits",
+)
+@click.option(
+    "--sparse",
+    help="only check out matching files; either a profile name ("
+    + ", ".join(SPARSE_PROFILES)
+    + ") or a comma separated list of patterns such as '*.py,tests/'",
+)
+@click.option(
+    "--share-starter",
+    is_flag=True,
+    help="set to keep a bare mirror of the starter code repository in "
+    "ROOT_DIR/.au and have new clones borrow its objects (the clones then "
+    "depend on that mirror, so do not delete it)",
+)
+@click.option(
+    "--at-deadline",
+    is_flag=True,
+    help="set to check out the last commit authored at or before the "
+    "assignment deadline in every repository, on a branch named "
+    f"{DEADLINE_BRANCH} (commit-all refuses to commit on it, and --update "
+    "returns to the default branch before pulling)",
+)
+@click.option(
+    "--worktree-dir",
+    type=click.Path(file_okay=False, path_type=Path),
+    help="with --at-deadline, create a worktree for each repository under this "
+    "directory rather than checking out the deadline commit in place",
+)
+@JobsOptions().options
 @DebugOptions().options
 def clone_all_cmd(
     root_dir: Path,
@@ -52,8 +138,16 @@ def clone_all_cmd(
     roster: Roster = None,
     preserve_prefix: bool = False,
     update: bool = False,
+    check_all: bool = False,
     skip_confirm: bool = False,
     preview: bool = False,
+    clone_filter: str = None,
+    depth: int = None,
+    sparse: str = None,
+    share_starter: bool = False,
+    at_deadline: bool = False,
+    worktree_dir: Path = None,
+    jobs: int = 1,
     **kwargs,
 ):
     """Clone all student repos for an assignment into ROOT_DIR.
@@ -64,7 +158,11 @@ def clone_all_cmd(
     \b
         if repository directory exists in ROOT_DIR
             if update flag is set
-                pull updates from GitHub
+                if commit count changed since the last sync (or --check-all)
+                    if remote head is not already in the local history
+                        pull updates from GitHub
+                else
+                    skip without contacting GitHub
             else
                 skip
         else
@@ -89,6 +187,11 @@ def clone_all_cmd(
     will be added to all assignments, as they are in GitHub. This will insure
     that all student assignment directory names are unique.
 
+    Use `--filter blob:none`, `--depth N` and/or `--sparse` to reduce the amount
+    of data transferred and stored for repositories that contain large files.
+    Commands that need commit history (e.g., time-details) fetch it
+    automatically when required.
+
     If ROOT_DIR is not provided, then the current working directory will be
     assumed.
     """
@@ -109,7 +212,22 @@ def clone_all_cmd(
         ):
             sys.exit(0)
 
-    clone_all(root_dir, assignment, roster, preserve_prefix, update, preview)
+    clone_all(
+        root_dir,
+        assignment,
+        roster,
+        preserve_prefix,
+        update,
+        preview,
+        check_all,
+        jobs,
+        clone_filter,
+        depth,
+        get_sparse_patterns(sparse) if sparse else None,
+        share_starter,
+        at_deadline,
+        worktree_dir,
+    )
 
 
 def clone_all(
@@ -119,6 +237,14 @@ def clone_all(
     preserve_prefix: bool = False,
     update: bool = False,
     preview: bool = False,
+    check_all: bool = False,
+    jobs: int = 1,
+    clone_filter: str = None,
+    depth: int = None,
+    sparse_patterns: list[str] = None,
+    share_starter: bool = False,
+    at_deadline: bool = False,
+    worktree_dir: Path = None,
 ):
     """clone all student submissions for an assignment into root_dir."""
     if preview:
@@ -140,6 +266,14 @@ def clone_all(
         )
         roster = None
 
+    # Journal every clone so an interrupted run can be resumed
+    journal = None
+    if not preview:
+        journal = Journal(root_dir, JOURNAL_FILE, {"assignment_id": assignment.id})
+        if journal.resumed:
+            logger.info("Resuming an interrupted clone-all")
+        remove_partial_clones(root_dir, journal.interrupted("clone"))
+
     console = Console()
     with console.status(
         "Retrieving data from GitHub Classroom", spinner="bouncingBall"
@@ -160,6 +294,7 @@ def clone_all(
                 a.students[0].login: a.repository.html_url
                 for a in submitted_assignments
             }
+            login_accepted_map = {a.students[0].login: a for a in accepted_assignments}
         else:
             # Get the group name for group assignments
             accepted_logins = [
@@ -178,6 +313,10 @@ def clone_all(
                 a.repository.name.removeprefix(assignment_prefix): a.repository.html_url
                 for a in submitted_assignments
             }
+            login_accepted_map = {
+                a.repository.name.removeprefix(assignment_prefix): a
+                for a in accepted_assignments
+            }
         if not roster:
             roster = Roster(accepted_logins)
         else:
@@ -208,52 +347,167 @@ def clone_all(
         for login in login_bad_dir_map:
             login_clone_dir_map.pop(login, None)
 
-        clones: list[str] = []
-        pulls: list[str] = []
-        skips: list[str] = []
-        errors: list[str] = []
-
         logger.debug("login_clone_dir_map: " + pformat(login_clone_dir_map))
         logger.debug("login_pull_dir_map" + pformat(login_all_dir_map))
         logger.debug("login_bad_dir_map" + pformat(login_bad_dir_map))
 
+    clones: list[str] = []
+    pulls: list[str] = []
+    skips: list[str] = []
+    unchanged: list[str] = []
+    errors: list[str] = []
+
+    # commit_count as of the last clone/pull, keyed by accepted assignment id
+    commit_counts = get_last_commit_counts(root_dir, assignment)
+    commit_counts_changed = False
+
+    def record_commit_count(login: str) -> None:
+        nonlocal commit_counts_changed
+        accepted = login_accepted_map.get(login)
+        if accepted and not preview:
+            commit_counts[str(accepted.id)] = accepted.commit_count
+            commit_counts_changed = True
+
+    if journal and journal.resumed:
+        # Repos cloned by the interrupted run now look like existing repos
+        for login, dir_name in list(login_pull_dir_map.items()):
+            if journal.is_done(dir_name, "clone"):
+                clones.append(roster.get_name(login))
+                record_commit_count(login)
+                del login_pull_dir_map[login]
+
+    if preview:
+        clones = [roster.get_name(login) for login in login_clone_dir_map]
+    else:
+        reference = None
+        if share_starter and login_clone_dir_map:
+            reference = get_starter_mirror(root_dir, assignment, console)
+        clone_jobs = {
+            dir_name: functools.partial(
+                clone,
+                login_url_map[login],
+                root_dir / dir_name,
+                filter=clone_filter,
+                depth=depth,
+                sparse_patterns=sparse_patterns,
+                reference=reference,
+            )
+            for login, dir_name in login_clone_dir_map.items()
+        }
+        journal.plan({dir_name: "clone" for dir_name in clone_jobs})
+        clone_jobs = {
+            dir_name: journal.track(dir_name, job)
+            for dir_name, job in clone_jobs.items()
+        }
+        results = run_jobs(clone_jobs, jobs, "Cloning", console)
         for login, dir_name in login_clone_dir_map.items():
-            repo_url = login_url_map[login]
-            status.update(status=f"CLONING {dir_name} from {repo_url}")
-            if not preview:
-                repo_path = root_dir / dir_name
-                try:
-                    GitRepo.clone(repo_url, repo_path)
-                    clones.append(roster.get_name(login))
-                except:
-                    logger.exception(
-                        f"Exception raised while cloning from {repo_url} into {repo_path}"
-                    )
-                    errors.append(roster.get_name(login))
-            else:
+            result = results[dir_name]
+            if result.ok:
                 clones.append(roster.get_name(login))
+                record_commit_count(login)
+                # Lets commit-all skip `git status` until something is changed
+                record_clean(root_dir, dir_name)
+            else:
+                logger.error(
+                    f"Exception raised while cloning from {login_url_map[login]} "
+                    f"into {root_dir / dir_name}: {result.error}"
+                )
+                errors.append(roster.get_name(login))
+
+    if update:
+        login_update_dir_map: dict[str, str] = {}
+        for login, dir_name in login_pull_dir_map.items():
+            accepted = login_accepted_map.get(login)
+            if (
+                not check_all
+                and accepted
+                and commit_counts.get(str(accepted.id)) == accepted.commit_count
+            ):
+                unchanged.append(roster.get_name(login))
+            else:
+                login_update_dir_map[login] = dir_name
 
-        if update:
-            for login, dir_name in login_pull_dir_map.items():
-                try:
-                    repo = GitRepo(root_dir / dir_name)
-                    if preview:
-                        status.update(status=f"Checking remote status for {dir_name}")
-                        if repo.needs_pull():
-                            pulls.append(roster.get_name(login))
-                        else:
-                            skips.append(roster.get_name(login))
-                    else:
-                        status.update(status=f"PULLING {dir_name}")
-                        if repo.pull():
-                            pulls.append(roster.get_name(login))
-                        else:
-                            skips.append(roster.get_name(login))
-                except:
-                    logger.exception(f"Exception raised while pulling {dir_name}")
-                    errors.append(roster.get_name(login))
-        else:
-            pulls = [roster.get_name(l) for l in login_pull_dir_map]
+        # Compare each remote head with local history to find the repos that
+        # are already up to date without fetching anything
+        remote_heads = get_remote_heads(
+            root_dir, login_update_dir_map, login_accepted_map, jobs, console
+        )
+        login_stale_dir_map: dict[str, str] = {}
+        for login, dir_name in login_update_dir_map.items():
+            sha = remote_heads.get(login)
+            if sha and contains_commit(root_dir / dir_name, sha):
+                skips.append(roster.get_name(login))
+                record_commit_count(login)
+            else:
+                login_stale_dir_map[login] = dir_name
+
+        def update_repo(login: str, dir_name: str) -> bool:
+            repo = GitRepo(root_dir / dir_name)
+            if preview:
+                # A known remote head that isn't in local history needs a pull
+                return login in remote_heads or repo.needs_pull()
+            current_branch = get_current_branch(root_dir / dir_name)
+            if current_branch == DEADLINE_BRANCH and login in login_accepted_map:
+                # Left at the deadline commit by --at-deadline
+                branch = login_accepted_map[login].repository.default_branch
+                logger.info(f"Checking out {branch} in {dir_name} to update it")
+                GitRepo.git("checkout", "--quiet", branch, path=root_dir / dir_name)
+            release_published_files(root_dir / dir_name)
+            return repo.pull()
+
+        update_jobs = {
+            dir_name: functools.partial(update_repo, login, dir_name)
+            for login, dir_name in login_stale_dir_map.items()
+        }
+        title = "Checking remote status" if preview else "Pulling"
+        results = run_jobs(update_jobs, jobs, title, console)
+        for login, dir_name in login_stale_dir_map.items():
+            result = results[dir_name]
+            if not result.ok:
+                logger.error(
+                    f"Exception raised while pulling {dir_name}: {result.error}"
+                )
+                errors.append(roster.get_name(login))
+                continue
+            if result.value:
+                pulls.append(roster.get_name(login))
+            else:
+                skips.append(roster.get_name(login))
+            record_commit_count(login)
+    else:
+        pulls = [roster.get_name(l) for l in login_pull_dir_map]
+
+    if commit_counts_changed:
+        save_state(
+            root_dir,
+            SYNC_STATE_FILE,
+            {"assignment_id": assignment.id, "commit_counts": commit_counts},
+        )
+    if journal:
+        remove_partial_clones(root_dir, journal.failed("clone"))
+        journal.close()
+
+    at_deadline_names: list[str] = []
+    before_deadline_names: list[str] = []
+    if at_deadline and not assignment.deadline:
+        logger.warning("The assignment has no deadline; ignoring --at-deadline")
+    elif at_deadline and not preview:
+        login_repo_dir_map = roster.get_login_dir_map(get_git_dirs(root_dir))
+        results = checkout_at_deadline(
+            root_dir, assignment, login_repo_dir_map, worktree_dir, jobs, console
+        )
+        for login, dir_name in login_repo_dir_map.items():
+            result = results[dir_name]
+            if not result.ok:
+                logger.error(
+                    f"Exception raised while checking out {dir_name} at the "
+                    f"deadline: {result.error}"
+                )
+                errors.append(roster.get_name(login))
+            elif result.value:
+                at_deadline_names.append(roster.get_name(login))
+            else:
+                before_deadline_names.append(roster.get_name(login))
 
     unsubmitted = [roster.get_name(login) for login in unsubmitted_logins]
     unaccepted = [
@@ -279,6 +533,30 @@ def clone_all(
         summary_rows.append(
             [f"Not Pulled - No Changes ({len(skips)})", "\n".join(skips)]
         )
+    if unchanged:
+        unchanged.sort()
+        summary_rows.append(
+            [
+                f"Not Pulled - Unchanged Since Last Sync ({len(unchanged)})",
+                "\n".join(unchanged),
+            ]
+        )
+    if at_deadline_names:
+        at_deadline_names.sort()
+        summary_rows.append(
+            [
+                f"Checked Out At Deadline ({len(at_deadline_names)})",
+                "\n".join(at_deadline_names),
+            ]
+        )
+    if before_deadline_names:
+        before_deadline_names.sort()
+        summary_rows.append(
+            [
+                f"No Commits Before Deadline ({len(before_deadline_names)})",
+                "\n".join(before_deadline_names),
+            ]
+        )
     if unsubmitted:
         unsubmitted.sort()
         summary_rows.append(
@@ -294,6 +572,142 @@ def clone_all(
         summary_rows.append([f"Errors ({len(errors)})", "\n".join(errors)])
 
     print(get_table(summary_rows, style=BasicScreenStyle(), separate_rows=True))
+    if unchanged:
+        print(
+            f"Skipped {len(unchanged)} of {len(login_pull_dir_map)} network "
+            "operations (commit count unchanged since the last sync)"
+        )
+
+
+def checkout_at_deadline(
+    root_dir: Path,
+    assignment: Assignment,
+    login_dir_map: dict[str, str],
+    worktree_dir: Path | None,
+    jobs: int,
+    console: Console,
+) -> dict[str, JobResult]:
+    """
+    Check out (on DEADLINE_BRANCH), or add a detached worktree for, the last
+    commit authored at or before the deadline in each repository. Each job's
+    value is the SHA, or None if there was no commit before the deadline.
+    Resolved SHAs are cached in ROOT_DIR/.au keyed by the remote branch tip,
+    so history is only walked again after new commits are pulled.
+    """
+    deadline = assignment.deadline.isoformat()
+    state = load_state(root_dir, DEADLINE_STATE_FILE, {})
+    cache: dict[str, dict] = (
+        state.get("shas", {}) if state.get("deadline") == deadline else {}
+    )
+
+    def checkout(dir_name: str) -> str | None:
+        repo_path = root_dir / dir_name
+        tip = get_upstream_sha(repo_path)
+        cached = cache.get(dir_name)
+        if cached and cached.get("tip") == tip:
+            sha = cached.get("sha")
+        else:
+            sha = get_commit_at(repo_path, assignment.deadline, tip or "HEAD")
+            cache[dir_name] = {"tip": tip, "sha": sha}
+        if sha:
+            if worktree_dir:
+                add_worktree(repo_path, worktree_dir / dir_name, sha)
+            else:
+                checkout_branch_at(repo_path, DEADLINE_BRANCH, sha)
+        return sha
+
+    deadline_jobs = {
+        dir_name: functools.partial(checkout, dir_name)
+        for dir_name in login_dir_map.values()
+    }
+    results = run_jobs(deadline_jobs, jobs, "Checking out at deadline", console)
+    save_state(root_dir, DEADLINE_STATE_FILE, {"deadline": deadline, "shas": cache})
+    return results
+
+
+def remove_partial_clones(root_dir: Path, dir_names: list[str]) -> None:
+    """
+    Delete whatever was left behind by unfinished or failed clones, which the
+    journal only lists for directories it planned to create.
+    """
+    for dir_name in dir_names:
+        repo_path = root_dir / dir_name
+        if Path(dir_name).name == dir_name and repo_path.is_dir():
+            logger.info(f"Removing partial clone {repo_path}")
+            shutil.rmtree(repo_path, ignore_errors=True)
+
+
+def get_remote_heads(
+    root_dir: Path,
+    login_dir_map: dict[str, str],
+    login_accepted_map: dict[str, AcceptedAssignment],
+    jobs: int,
+    console: Console,
+) -> dict[str, str]:
+    """
+    The SHA at the head of each remote repository, keyed by login. Uses one
+    GraphQL query per 100 repositories, falling back to concurrent
+    `git ls-remote` calls for any that couldn't be resolved that way.
+    """
+    login_node_map = {
+        login: login_accepted_map[login].repository.node_id
+        for login in login_dir_map
+        if login in login_accepted_map
+    }
+    heads: dict[str, str] = {}
+    with console.status("Retrieving remote heads from GitHub"):
+        try:
+            heads = get_repository_heads(login_node_map.values())
+        except Exception:
+            logger.debug("Unable to retrieve remote heads", exc_info=True)
+    login_heads = {
+        login: heads[node_id]
+        for login, node_id in login_node_map.items()
+        if node_id in heads
+    }
+
+    ls_remote_jobs = {
+        dir_name: functools.partial(get_remote_head_sha, root_dir / dir_name)
+        for login, dir_name in login_dir_map.items()
+        if login not in login_heads
+    }
+    results = run_jobs(ls_remote_jobs, jobs, "Checking remote heads", console)
+    for login, dir_name in login_dir_map.items():
+        result = results.get(dir_name)
+        if result and result.ok and result.value:
+            login_heads[login] = result.value
+    return login_heads
+
+
+def get_starter_mirror(
+    root_dir: Path, assignment: Assignment, console: Console
+) -> Path | None:
+    """
+    Create or refresh the bare mirror of the assignment's starter code
+    repository that student clones use as a reference (via git alternates).
+    """
+    starter = assignment.starter_code_repository
+    if not starter:
+        logger.warning("Assignment has no starter code repository to share")
+        return None
+    mirror_path = get_state_dir(root_dir) / STARTER_MIRROR_DIR
+    with console.status(f"Mirroring starter code from {starter.html_url}"):
+        try:
+            return update_mirror(starter.html_url, mirror_path)
+        except Exception:
+            logger.exception(f"Unable to mirror starter code from {starter.html_url}")
+            return None
+
+
+def get_last_commit_counts(root_dir: Path, assignment: Assignment) -> dict[str, int]:
+    """
+    The commit_count of each accepted assignment as of the last time it was
+    cloned or pulled into root_dir, keyed by the accepted assignment id.
+    """
+    state = load_state(root_dir, SYNC_STATE_FILE, {})
+    if state.get("assignment_id") != assignment.id:
+        return {}
+    return state.get("commit_counts", {})
 
 
 if __name__ == "__main__":
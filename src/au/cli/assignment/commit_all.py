@@ -1,5 +1,9 @@
+import functools
+import os
 import sys
+import time
 from pathlib import Path
+from typing import Any, Callable, Generator
 import logging
 
 import click
@@ -7,13 +11,52 @@ from rich.console import Console
 
 from craftable import get_table
 from craftable.styles import BasicScreenStyle
-from git_wrap import get_git_repos
+from git_wrap import GitRepo, get_git_repos
 
-from au.click import DebugOptions, BasePath
+from au.click import DebugOptions, BasePath, JobsOptions
+from au.common.git_tools import DEADLINE_BRANCH, get_current_branch, pull_rebase
+from au.common.parallel import call_with_retries, run_staged_jobs
+from au.common.worktree_index import is_known_clean, record_clean, take_snapshot
+
+from .publish_feedback import release_published_files
 
 
 logger = logging.getLogger(__name__)
 
+STAGES = ["status", "pull", "add", "commit", "push"]
+NETWORK_STAGES = {"pull", "push"}
+
+# Messages of git failures worth retrying: the network, not the repo, failed
+_NETWORK_ERRORS = (
+    "could not resolve host",
+    "failed to connect",
+    "connection refused",
+    "connection reset",
+    "connection timed out",
+    "operation timed out",
+    "network is unreachable",
+    "unable to access",
+    "the remote end hung up",
+    "early eof",
+    "rpc failed",
+    "could not read from remote repository",
+)
+
+# Messages of a push rejected because the remote has commits we don't
+_REJECTED_PUSH = ("[rejected]", "non-fast-forward", "fetch first")
+
+
+def _error_text(ex: Exception) -> str:
+    return f"{ex} {getattr(ex, 'stderr', None) or ''}".lower()
+
+
+def is_network_error(ex: Exception) -> bool:
+    return any(message in _error_text(ex) for message in _NETWORK_ERRORS)
+
+
+def is_rejected_push(ex: Exception) -> bool:
+    return any(message in _error_text(ex) for message in _REJECTED_PUSH)
+
 
 @click.command()
 @click.argument("root_dir", type=BasePath(resolve_path=True), default=".")
@@ -31,11 +74,21 @@ logger = logging.getLogger(__name__)
     is_flag=True,
     help="set to show changes without actually making them",
 )
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=2,
+    show_default=True,
+    help="the number of times to retry a failed pull or push",
+)
+@JobsOptions().options
 @DebugOptions().options
 def commit_all(
     root_dir: Path,
     message: str = "Posting feedback",
     preview: bool = False,
+    retries: int = 2,
+    jobs: int = 1,
     quiet: bool = False,
     debug: bool = False,
 ):
@@ -49,6 +102,19 @@ def commit_all(
         + commit using --message
         + push all changes to the remote
 
+    Repositories are processed concurrently. Local steps and network steps
+    (pull/push) are limited separately, and network steps that fail because of
+    the network are retried. A push rejected because the student pushed in
+    the meantime is pulled (rebasing the commit onto theirs) and pushed again.
+
+    Local copies of files that publish-feedback already committed on GitHub
+    are dropped first (as clone-all --update does), so they don't block the
+    pull.
+
+    Repositories with changes that aren't on a branch (e.g., left at the
+    deadline by clone-all --at-deadline) are reported as errors rather than
+    committed.
+
     If ROOT_DIR is not provided, then the current working directory will be
     assumed.
 
@@ -61,43 +127,113 @@ def commit_all(
     errors = []
 
     console = Console()
-    with console.status(
-        "Finding all local Git repositories", spinner="bouncingBall"
-    ) as status:
-
+    with console.status("Finding all local Git repositories", spinner="bouncingBall"):
         all_repos = get_git_repos(root_dir)
 
-        for repo in all_repos:
-            status.update(status=f"{repo.name}: Checking for changes")
-            if repo.name.startswith("_"):
-                skips.append([repo.name, "special directory"])
-                continue
+    repos: list[GitRepo] = []
+    for repo in all_repos:
+        if repo.name.startswith("_"):
+            skips.append([repo.name, "special directory"])
+        else:
+            repos.append(repo)
 
-            if not repo.is_dirty():
-                skips.append([repo.name, "no changes to commit"])
-                continue
+    # Local stages (status/add/commit) run on threads bounded by the CPU count
+    # and network stages (pull/push) on threads bounded by --jobs, so slow
+    # pushes don't hold up local work
+    pool_sizes = {"local": os.cpu_count() or 1, "network": jobs}
+    timings: dict[str, dict[str, float]] = {repo.name: {} for repo in repos}
+    unchanged: list[str] = []
 
-            if preview:
-                commits.append([repo.name, "WOULD COMMIT"])
-                continue
+    def is_dirty(repo: GitRepo) -> bool:
+        # Skip `git status` entirely if no file has changed since the repo was
+        # last recorded as clean (by clone-all, eval-assignment, gen-feedback
+        # or an earlier commit-all). Only git can say a repo has changes.
+        if is_known_clean(root_dir, repo.name):
+            unchanged.append(repo.name)
+            return False
+        if preview:
+            # Nothing is written to ROOT_DIR/.au in preview mode
+            return repo.is_dirty()
+        snapshot = take_snapshot(root_dir / repo.name)
+        if repo.is_dirty():
+            return True
+        if snapshot:
+            record_clean(root_dir, repo.name, snapshot)
+        return False
 
-            try:
-                status.update(status=f"{repo.name}: git pull")
-                repo.pull()
+    def run_stage(repo: GitRepo, stage: str, func: Callable[[], Any]) -> Any:
+        start = time.monotonic()
+        try:
+            if stage in NETWORK_STAGES:
+                return call_with_retries(
+                    func,
+                    retries,
+                    description=f"{repo.name}: git {stage}",
+                    retry_if=is_network_error,
+                )
+            return func()
+        finally:
+            timings[repo.name][stage] = time.monotonic() - start
 
-                status.update(status=f"{repo.name}: git add .")
-                repo.add()
+    def push(repo: GitRepo) -> None:
+        try:
+            repo.push()
+        except Exception as ex:
+            if not is_rejected_push(ex):
+                raise
+            # The remote gained commits since the pull (e.g., the student
+            # pushed), so put ours on top of them and push again
+            logger.info(f"{repo.name}: push rejected; pulling before pushing again")
+            pull_rebase(root_dir / repo.name)
+            repo.push()
 
-                status.update(status=f"{repo.name}: git commit -m {message}")
-                repo.commit(message)
+    def check_branch(repo: GitRepo) -> None:
+        # Pulling and pushing need the branch that tracks the student's repo
+        branch = get_current_branch(root_dir / repo.name)
+        if branch == DEADLINE_BRANCH:
+            raise RuntimeError(
+                f"checked out at the deadline ({DEADLINE_BRANCH}); run "
+                "clone-all --update to return to the default branch"
+            )
+        if branch is None:
+            raise RuntimeError("HEAD is detached; check out a branch first")
 
-                status.update(status=f"{repo.name}: git push")
-                repo.push()
+    def commit_repo(repo: GitRepo) -> Generator[str, None, bool]:
+        """Returns whether the repo had changes to commit."""
+        yield "local"
+        if not preview:
+            # Untracked local copies of files publish-feedback committed on
+            # GitHub would make the pull fail
+            release_published_files(root_dir / repo.name)
+        if not run_stage(repo, "status", lambda: is_dirty(repo)):
+            return False
+        # Only an error if there is something to commit
+        check_branch(repo)
+        if preview:
+            return True
+        yield "network"
+        run_stage(repo, "pull", repo.pull)
+        yield "local"
+        run_stage(repo, "add", repo.add)
+        run_stage(repo, "commit", lambda: repo.commit(message))
+        yield "network"
+        run_stage(repo, "push", lambda: push(repo))
+        yield "local"
+        record_clean(root_dir, repo.name)
+        return True
 
-                commits.append([repo.name, "COMMITTED"])
-            except Exception as ex:
-                logger.exception("Error occurred running git command")
-                errors.append([repo.name, str(ex)])
+    commit_jobs = {repo.name: functools.partial(commit_repo, repo) for repo in repos}
+    results = run_staged_jobs(commit_jobs, pool_sizes, "Committing", console)
+    for name, result in results.items():
+        if not result.ok:
+            logger.error(
+                f"Error occurred running git command in {name}: {result.error}"
+            )
+            errors.append([name, str(result.error)])
+        elif not result.value:
+            skips.append([name, "no changes to commit"])
+        else:
+            commits.append([name, "WOULD COMMIT" if preview else "COMMITTED"])
 
     # Print a summary
     if quiet:
@@ -113,15 +249,43 @@ def commit_all(
     print(get_table(all_dirs, col_defs=["", "A"], style=BasicScreenStyle()))
 
     summary = []
-    summary.append([f"Root Directory", root_dir])
+    summary.append(["Root Directory", root_dir])
     if preview:
-        summary.append([f"Repositories to Commit", len(commits)])
+        summary.append(["Repositories to Commit", len(commits)])
     else:
-        summary.append([f"Repositories Pushed", len(commits)])
-    summary.append([f"Directories Skipped", len(skips)])
-    summary.append([f"Errors Encountered", len(errors)])
+        summary.append(["Repositories Pushed", len(commits)])
+    summary.append(["Directories Skipped", len(skips)])
+    summary.append(["Unchanged (git status skipped)", len(unchanged)])
+    summary.append(["Errors Encountered", len(errors)])
     print(get_table(summary, style=BasicScreenStyle()))
 
+    if not quiet:
+        print_stage_timings(timings)
+
+
+def print_stage_timings(timings: dict[str, dict[str, float]]) -> None:
+    rows = []
+    for stage in STAGES:
+        times = [t[stage] for t in timings.values() if stage in t]
+        if times:
+            rows.append(
+                [
+                    f"git {stage}",
+                    len(times),
+                    f"{sum(times):.1f}s",
+                    f"{sum(times) / len(times):.2f}s",
+                    f"{max(times):.2f}s",
+                ]
+            )
+    if rows:
+        print(
+            get_table(
+                rows,
+                header_row=["STAGE", "REPOS", "TOTAL", "AVERAGE", "MAX"],
+                style=BasicScreenStyle(),
+            )
+        )
+
 
 if __name__ == "__main__":
     commit_all()
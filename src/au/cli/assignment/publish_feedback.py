@@ -0,0 +1,202 @@
+import base64
+import functools
+import logging
+import sys
+from pathlib import Path
+from urllib.parse import quote
+
+import click
+from rich.console import Console
+
+from craftable import get_table
+from craftable.styles import BasicScreenStyle
+from git_wrap import GitRepo, get_git_dirs
+
+from au.classroom import gh_api_raw
+from au.click import BasePath, DebugOptions, JobsOptions
+from au.common.git_tools import get_blob_sha, get_github_repo_name
+from au.common.parallel import call_with_retries, run_jobs
+from au.common.state import load_state, save_state
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FEEDBACK_FILE_NAME = "FEEDBACK.md"
+PUBLISHED_STATE_FILE = "published_files.json"
+
+
+@click.command("publish-feedback")
+@click.argument("root_dir", type=BasePath(resolve_path=True), default=".")
+@click.option(
+    "-f",
+    "--feedback-filename",
+    type=str,
+    default=DEFAULT_FEEDBACK_FILE_NAME,
+    show_default=True,
+    help="the file (relative to each repository) to publish",
+)
+@click.option(
+    "-m",
+    "--message",
+    type=str,
+    default="Posting feedback",
+    show_default=True,
+    help="the commit message to use on GitHub",
+)
+@click.option(
+    "-p",
+    "--preview",
+    is_flag=True,
+    help="set to show changes without actually making them",
+)
+@click.option(
+    "--retries",
+    type=click.IntRange(min=0),
+    default=2,
+    show_default=True,
+    help="the number of times to retry a failed update",
+)
+@JobsOptions().options
+@DebugOptions().options
+def publish_feedback(
+    root_dir: Path,
+    feedback_filename: str = DEFAULT_FEEDBACK_FILE_NAME,
+    message: str = "Posting feedback",
+    preview: bool = False,
+    retries: int = 2,
+    jobs: int = 1,
+    quiet: bool = False,
+    **kwargs,
+):
+    """Publish feedback files in ROOT_DIR directly to GitHub.
+
+    For each student repository in ROOT_DIR that contains the feedback file,
+    compare it with the version on the repository's default branch on GitHub
+    (by blob SHA) and, if it differs, commit it there through the GitHub API.
+    Nothing is pulled, committed or pushed locally, so this works even if the
+    student has pushed since the repository was cloned.
+
+    The local copies are left in place. `au assignment clone-all --update`
+    takes care of them before pulling the published commits.
+
+    If ROOT_DIR is not provided, then the current working directory will be
+    assumed.
+    """
+    logging.basicConfig()
+
+    repo_paths = [
+        path
+        for path in get_git_dirs(root_dir)
+        if not path.name.startswith("_") and (path / feedback_filename).is_file()
+    ]
+    if not repo_paths:
+        print(f"No repositories containing {feedback_filename} found")
+        sys.exit(0)
+
+    publish_jobs = {
+        path.name: functools.partial(
+            call_with_retries,
+            functools.partial(publish_file, path, feedback_filename, message, preview),
+            retries,
+            description=f"{path.name}: publishing {feedback_filename}",
+        )
+        for path in repo_paths
+    }
+    results = run_jobs(publish_jobs, jobs, "Publishing", Console())
+
+    published = load_state(root_dir, PUBLISHED_STATE_FILE, {})
+    rows = []
+    counts = {"PUBLISHED": 0, "UNCHANGED": 0, "WOULD PUBLISH": 0, "ERROR": 0}
+    for name, result in results.items():
+        if not result.ok:
+            logger.error(f"Unable to publish {feedback_filename} in {name}")
+            rows.append([name, str(result.error)])
+            counts["ERROR"] += 1
+            continue
+        status, sha = result.value
+        counts[status] += 1
+        if status == "PUBLISHED":
+            published.setdefault(name, {})[feedback_filename] = sha
+        if not quiet or status != "UNCHANGED":
+            rows.append([name, status])
+    if counts["PUBLISHED"]:
+        save_state(root_dir, PUBLISHED_STATE_FILE, published)
+
+    rows.sort()
+    if rows:
+        print(get_table(rows, col_defs=["", "A"], style=BasicScreenStyle()))
+
+    summary = []
+    summary.append(["Root Directory", root_dir])
+    if preview:
+        summary.append(["Files to Publish", counts["WOULD PUBLISH"]])
+    else:
+        summary.append(["Files Published", counts["PUBLISHED"]])
+    summary.append(["Files Unchanged", counts["UNCHANGED"]])
+    summary.append(["Errors Encountered", counts["ERROR"]])
+    print(get_table(summary, style=BasicScreenStyle()))
+
+
+def publish_file(
+    repo_path: Path, file_name: str, message: str, preview: bool = False
+) -> tuple[str, str]:
+    """
+    Commit repo_path/file_name to the GitHub repository's default branch unless
+    the same content is already there. Returns (status, blob SHA).
+    """
+    full_name = get_github_repo_name(repo_path)
+    if not full_name:
+        raise ValueError("origin is not a GitHub repository")
+    data = (repo_path / file_name).read_bytes()
+    sha = get_blob_sha(data)
+    remote_sha = get_remote_blob_sha(full_name, file_name)
+    if remote_sha == sha:
+        return "UNCHANGED", sha
+    if preview:
+        return "WOULD PUBLISH", sha
+
+    fields = {"message": message, "content": base64.b64encode(data).decode()}
+    if remote_sha:
+        fields["sha"] = remote_sha
+    result = gh_api_raw(
+        f"repos/{full_name}/contents/{quote(file_name)}", method="PUT", **fields
+    )
+    if result is None:
+        raise RuntimeError(f"GitHub rejected the update to {full_name}")
+    return "PUBLISHED", sha
+
+
+def get_remote_blob_sha(full_name: str, file_name: str) -> str | None:
+    """
+    Blob SHA of file_name on the default branch, or None if it doesn't exist.
+    Lists the parent directory so a missing file isn't reported as an error.
+    """
+    parent, _, name = file_name.rpartition("/")
+    endpoint = f"repos/{full_name}/contents"
+    if parent:
+        endpoint += f"/{quote(parent)}"
+    listing = gh_api_raw(endpoint)
+    if listing is None:
+        raise RuntimeError(f"Unable to read {endpoint}")
+    for entry in listing if isinstance(listing, list) else []:
+        if entry.get("name") == name and entry.get("type") == "file":
+            return entry.get("sha")
+    return None
+
+
+def release_published_files(repo_path: Path) -> None:
+    """
+    Drop local copies of files that publish-feedback committed on GitHub, as
+    long as they are still identical to what was published, so that pulling
+    the published commit doesn't fail on them.
+    """
+    repo_path = Path(repo_path)
+    published = load_state(repo_path.parent, PUBLISHED_STATE_FILE, {})
+    for file_name, sha in published.get(repo_path.name, {}).items():
+        file = repo_path / file_name
+        if not file.is_file() or get_blob_sha(file.read_bytes()) != sha:
+            continue
+        if GitRepo.git("ls-files", "--", file_name, path=repo_path).stdout.strip():
+            GitRepo.git("checkout", "--", file_name, path=repo_path)
+        else:
+            file.unlink()
@@ -1,4 +1,6 @@
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
+import functools
 import logging
 import sys
 from pathlib import Path
@@ -12,9 +14,18 @@ from craftable.styles import BasicScreenStyle
 from git_wrap import GitRepo
 
 from au.classroom import Assignment, get_accepted_assignments, Roster
-from au.click import BasePath, AssignmentOptions, RosterOptions, DebugOptions
+from au.click import (
+    BasePath,
+    AssignmentOptions,
+    CacheOptions,
+    RosterOptions,
+    DebugOptions,
+    JobsOptions,
+)
 from au.common import draw_double_line
 from au.common.datetime import get_friendly_local_datetime, get_friendly_timedelta
+from au.common.commit_cache import get_cached_commits_until
+from au.common.git_tools import MAX_LOG_COMMITS
 
 
 logger = logging.getLogger(__name__)
@@ -22,15 +33,26 @@ logger = logging.getLogger(__name__)
 
 @click.command()
 @click.argument("root_dir", type=BasePath(), default=".")
-@AssignmentOptions().options
+@CacheOptions().options
+@AssignmentOptions(prefetch_accepted=True, prefetch_needs_roster=True).options
 @RosterOptions(prompt=True).options
 @click.option("--late-only", is_flag=True, help="set to only show late students")
+@click.option(
+    "--max-commits",
+    type=click.IntRange(min=1),
+    default=MAX_LOG_COMMITS,
+    show_default=True,
+    help="the most commits to read from each repository",
+)
+@JobsOptions().options
 @DebugOptions().options
 def time_details(
     root_dir: Path,
     assignment: Assignment = None,
     roster: Roster = None,
     late_only: bool = False,
+    max_commits: int = MAX_LOG_COMMITS,
+    jobs: int = 1,
     **kwargs,
 ):
     """Show submission times for the assignment in ROOT_DIR.
@@ -103,7 +125,25 @@ def time_details(
 
         status.update(status="Gathering time details from each repository")
 
-        for dir_name, repo in repo_dirs.items():
+        # Each walk stops at the GitHub Classroom commit (or after max_commits),
+        # so the cost depends on the number of repos rather than history size.
+        # Repos whose HEAD hasn't moved since the last run are read from cache.
+        def is_classroom_commit(commit) -> bool:
+            return (
+                commit.author_email != self_email and commit.committer_name == "GitHub"
+            )
+
+        read_history = functools.partial(
+            get_cached_commits_until,
+            root_dir,
+            cache_key=f"time_details:{self_email}",
+            is_boundary=is_classroom_commit,
+            max_count=max_commits,
+        )
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            histories = executor.map(read_history, repo_dirs)
+
+        for dir_name, commits in zip(repo_dirs, histories):
             submission = _Submission(dir_name)
             submissions.append(submission)
             if dir_login_map:
@@ -112,7 +152,7 @@ def time_details(
                     submission.name = roster.get_name(login)
 
             last_student_commit_date = None  # assume user submission
-            for commit in repo.get_commits():
+            for commit in commits:
                 if commit.author_email == self_email:
                     continue
                 if "GitHub" == commit.committer_name:
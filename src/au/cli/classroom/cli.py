@@ -0,0 +1,17 @@
+import click
+
+from au.click import AliasedGroup
+
+from .sync import sync
+
+
+@click.group(cls=AliasedGroup)
+def classroom():
+    """Commands for working with GitHub Classroom data."""
+
+
+classroom.add_command(sync)
+
+
+if __name__ == "__main__":
+    classroom()
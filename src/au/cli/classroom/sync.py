@@ -0,0 +1,108 @@
+import logging
+import sys
+
+import click
+from rich.console import Console
+
+from craftable import get_table
+from craftable.styles import BasicScreenStyle
+
+from au.classroom import (
+    CacheMode,
+    get_classroom_index,
+    get_classroom_tree,
+    set_cache_mode,
+    set_index_fallback,
+)
+from au.click import DebugOptions
+
+
+logger = logging.getLogger(__name__)
+
+
+@click.command()
+@click.option(
+    "--include-archived",
+    is_flag=True,
+    help="set to also sync archived classrooms",
+)
+@click.option(
+    "--max-concurrency",
+    type=int,
+    default=8,
+    show_default=True,
+    help="the maximum number of GitHub API requests to run at once",
+)
+@DebugOptions().options
+def sync(
+    include_archived: bool = False,
+    max_concurrency: int = 8,
+    **kwargs,
+):
+    """Mirror all GitHub Classroom data into the local classroom index.
+
+    Retrieves every classroom, assignment, and accepted assignment and stores
+    them in a local SQLite database, in one transaction. This is the only
+    command that writes to it. Whatever can't be retrieved is reported and
+    left as it was in the index. Commands run with `--offline` answer from this
+    index instead of contacting GitHub, and all commands fall back to it (with
+    a warning about how old the data is) if GitHub cannot be reached.
+    """
+    logging.basicConfig()
+
+    index = get_classroom_index()
+    if not index:
+        logger.fatal("Unable to open the local classroom index")
+        sys.exit(1)
+
+    # Revalidate everything, since unchanged data only costs a 304, and never
+    # answer from the index itself
+    set_cache_mode(CacheMode.REFRESH)
+    set_index_fallback(False)
+    with Console().status(
+        "Retrieving data from GitHub Classroom", spinner="bouncingBall"
+    ):
+        trees = get_classroom_tree(include_archived, max_concurrency)
+    if trees is None:
+        logger.fatal("Unable to retrieve the classrooms; the index was not changed")
+        sys.exit(1)
+    index.store_trees(trees)
+
+    rows = []
+    failures = []
+    for tree in trees:
+        name = tree.classroom.name
+        if tree.assignments is None:
+            failures.append(f"assignments of {name}")
+            rows.append([name, "FAILED", "-"])
+            continue
+        accepted = 0
+        for assignment_tree in tree.assignments:
+            if assignment_tree.accepted_assignments is None:
+                failures.append(
+                    f"accepted assignments of {name} / "
+                    f"{assignment_tree.assignment.title}"
+                )
+            else:
+                accepted += len(assignment_tree.accepted_assignments)
+        rows.append([name, len(tree.assignments), accepted])
+    rows.sort(key=lambda row: row[0].casefold())
+    print(
+        get_table(
+            header_row=["CLASSROOM", "ASSIGNMENTS", "ACCEPTED"],
+            value_rows=rows,
+            col_defs=["", "^", "^"],
+            style=BasicScreenStyle(),
+        )
+    )
+    print(f"Classroom index: {index.file}")
+
+    if failures:
+        # What is already in the index for these is kept rather than emptied
+        for failure in failures:
+            logger.error(f"Unable to retrieve the {failure}; kept the stored data")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    sync()
@@ -3,6 +3,7 @@ from au.click import AliasedGroup
 from importlib.metadata import version, PackageNotFoundError
 
 from .assignment import assignment
+from .classroom import classroom
 from .python import python
 from .repo import repo
 from .sql import sql
@@ -31,6 +32,7 @@ def main():
 
 
 main.add_command(assignment)
+main.add_command(classroom)
 main.add_command(python)
 main.add_command(repo)
 main.add_command(sql)
@@ -1,8 +1,12 @@
+import fnmatch
+import hashlib
+import importlib.metadata
 import logging
 import os
+import subprocess
 import sys
 from io import StringIO
-from pathlib import Path
+from pathlib import Path, PurePosixPath
 from datetime import datetime, date
 import json
 
@@ -14,13 +18,23 @@ import click
 from rich.console import Console
 
 from au.common import draw_double_line
-from git_wrap import GitRepo, Commit
+from git_wrap import GitRepo
 
 from au.classroom import Assignment, Roster
-from au.click import BasePath, AssignmentOptions, RosterOptions, DebugOptions
+from au.click import (
+    BasePath,
+    AssignmentOptions,
+    CacheOptions,
+    RosterOptions,
+    DebugOptions,
+)
 from au.common import draw_single_line
 from au.common.datetime import get_friendly_timedelta
+from au.common.commit_cache import get_cached_commits_until, read_head_sha
+from au.common.git_tools import LogCommit
+from au.common.worktree_index import get_current_entry, invalidate, record_writes
 
+from .limits import EvalLimits, EvalLimitsOptions, LimitsPlugin, process_limits
 from .pytest_reporter import PytestResultsReporter
 from .scoring import get_summary
 from .types import StudentResults
@@ -31,6 +45,59 @@ logger = logging.getLogger(__name__)
 
 RESULTS_FILE_NAME = ".eval_results.json"
 
+LINT_DISABLED = [
+    "invalid-name",
+    "missing-module-docstring",
+    "missing-class-docstring",
+    "missing-function-docstring",
+    "trailing-whitespace",
+    "missing-final-newline",
+    "trailing-newlines",
+    "unnecessary-negation",
+    "wrong-import-order",
+    "duplicate-code",
+    "too-few-public-methods",
+    "too-many-arguments",
+    "too-many-locals",
+    "too-many-statements",
+    "bare-except",
+    "f-string-without-interpolation",
+    "chained-comparison",
+    "consider-using-sys-exit",
+    "singleton-comparison",
+    "consider-using-max-builtin",
+    # 'bad-indentation',
+    "redefined-outer-name",
+    "simplifiable-if-statement",
+    "no-else-return",
+    "inconsistent-return-statements",
+]
+
+# Versions of the tools that produce the results (see get_eval_key)
+EVAL_TOOLS = ["pytest", "pylint", "astroid"]
+
+# Untracked files the results can depend on (see get_eval_key). Anything else
+# untracked is taken to be a by-product of running the tests or of au itself.
+UNTRACKED_SOURCE_PATTERNS = [
+    "*.py",
+    "*.txt",
+    "*.csv",
+    "*.json",
+    "*.ini",
+    "*.toml",
+    "*.cfg",
+]
+
+# Directories holding bytecode and tool caches, tracked or not
+CACHE_DIR_NAMES = {
+    "__pycache__",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".ruff_cache",
+    ".venv",
+    "venv",
+}
+
 
 def _json_serialize(obj):
     if isinstance(obj, (datetime, date)):
@@ -47,23 +114,104 @@ def _json_deserialize_hook(dct: dict):
     return dct
 
 
+def get_eval_key(
+    student_dir: Path,
+    student_name: str,
+    assignment: Assignment | None = None,
+    no_git: bool = False,
+    limits: EvalLimits | None = None,
+) -> str | None:
+    """
+    A hash of everything the results of eval_assignment depend on: the content
+    of the files in student_dir that are tracked, or untracked but not ignored
+    and matching UNTRACKED_SOURCE_PATTERNS (tests and data files included; the
+    results file, Markdown such as the feedback file and anything under
+    CACHE_DIR_NAMES excluded), HEAD, LINT_DISABLED, the tool and Python
+    versions and the evaluation settings (limits included). None if the files
+    can't be listed, in which case results are never reused.
+    """
+    # -t tags each file: "? " for untracked ones
+    result = subprocess.run(
+        ["git", "ls-files", "-z", "-t", "--cached", "--others", "--exclude-standard"],
+        cwd=student_dir,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    file_names = set()
+    for entry in result.stdout.split("\0"):
+        if not entry:
+            continue
+        tag, name = entry.split(" ", 1)
+        path = PurePosixPath(name)
+        if (
+            name == RESULTS_FILE_NAME
+            or path.suffix == ".md"
+            or not CACHE_DIR_NAMES.isdisjoint(path.parts[:-1])
+        ):
+            continue
+        if tag == "?" and not any(
+            fnmatch.fnmatch(path.name, pattern) for pattern in UNTRACKED_SOURCE_PATTERNS
+        ):
+            continue
+        file_names.add(name)
+
+    digest = hashlib.sha256()
+
+    def add(*values) -> None:
+        for value in values:
+            digest.update(str(value).encode() + b"\0")
+
+    add(student_name, no_git, limits, read_head_sha(student_dir), sys.version)
+    if assignment:
+        add(assignment.title, assignment.deadline)
+    add(*LINT_DISABLED)
+    for tool in EVAL_TOOLS:
+        try:
+            add(tool, importlib.metadata.version(tool))
+        except importlib.metadata.PackageNotFoundError:
+            add(tool, None)
+    for name in sorted(file_names):
+        try:
+            with open(student_dir / name, "rb") as fi:
+                add(name, hashlib.file_digest(fi, "sha256").hexdigest())
+        except OSError:
+            # Deleted from the worktree (or not a regular file)
+            add(name, None)
+    return digest.hexdigest()
+
+
 def retrieve_student_results(student_dir: Path) -> StudentResults:
     results_file = student_dir / RESULTS_FILE_NAME
     with open(results_file, "r") as fi:
         return json.load(fi, object_hook=_json_deserialize_hook)
 
 
+def save_student_results(student_dir: Path, student_results: StudentResults) -> None:
+    results_file = student_dir / RESULTS_FILE_NAME
+    with open(results_file, "w") as fi:
+        json.dump(student_results, fi, indent=2, default=_json_serialize)
+
+
 @click.command("eval-assignment")
 @click.argument("student_dir", type=BasePath(), required=True)
+@CacheOptions().options
 @AssignmentOptions(store=False).options
 @RosterOptions(store=False, prompt=True).options
 @click.option("--no-git", is_flag=True, help="set to disable git repo checks")
+@click.option(
+    "--force",
+    is_flag=True,
+    help="set to evaluate again even if the results are already up to date",
+)
 @click.option(
     "--student-name",
     type=str,
     help="If no roster is provided, you can provide the name of the student. "
     "If neither is provided, the name will just be STUDENT_DIR.",
 )
+@EvalLimitsOptions().options
 @DebugOptions().options
 def eval_assignment_cmd(
     student_dir: Path,
@@ -71,9 +219,14 @@ def eval_assignment_cmd(
     roster: Roster | None = None,
     no_git: bool = False,
     student_name: str | None = None,
+    force: bool = False,
+    limits: EvalLimits | None = None,
     **kwargs,
 ) -> None:
-    """Run automated grading tests on a single student directory."""
+    """Run automated grading tests on a single student directory.
+
+    With any resource limit, the tests are run in a separate worker process.
+    """
     logging.basicConfig()
 
     draw_double_line()
@@ -103,7 +256,17 @@ def eval_assignment_cmd(
     if not stu_name:
         stu_name = student_dir.name
 
-    student_results = eval_assignment(student_dir, stu_name, assignment, no_git)
+    if limits and limits.enabled:
+        # Imported here as eval_worker itself imports this module
+        from .eval_worker import eval_isolated
+
+        student_results = eval_isolated(
+            student_dir, stu_name, assignment, no_git, force, limits
+        )
+    else:
+        student_results = eval_assignment(
+            student_dir, stu_name, assignment, no_git, force, limits
+        )
 
     if student_results:
         draw_single_line(f"Summary Results")
@@ -117,18 +280,50 @@ def eval_assignment(
     student_name: str | None,
     assignment: Assignment | None = None,
     no_git: bool = False,
+    force: bool = False,
+    limits: EvalLimits | None = None,
+    isolated: bool = False,
 ) -> StudentResults | None:
     """
     Run automated grading tests on a single student directory.
+
+    The previous results are reused if nothing they depend on has changed
+    (see get_eval_key), unless force is set.
+
+    The tests are run within limits. Exceeding one is recorded as an error on
+    the affected tests rather than holding up or crashing the caller.
+
+    Set isolated when running in a process of its own that exits afterwards
+    (see eval_worker). The student's modules are then left loaded instead of
+    being purged from sys.modules so that the next student starts clean.
+    Limits can only be enforced that way.
     """
     student_dir = student_dir.resolve()
     dir_name = student_dir.name
     os.chdir(student_dir)
-    student_results: StudentResults = {}
 
     if not student_name:
         student_name = dir_name
 
+    limits = limits or EvalLimits()
+    if limits.enabled and not isolated:
+        raise ValueError("Resource limits are only enforced in a worker process")
+    eval_key = get_eval_key(student_dir, student_name, assignment, no_git, limits)
+    if eval_key and not force:
+        try:
+            previous_results = retrieve_student_results(student_dir)
+            if previous_results.get("eval_key") == eval_key:
+                print(f"Results for {dir_name} are up to date (use --force to rerun)")
+                return previous_results
+        except (OSError, ValueError):
+            pass
+
+    # Running the tests writes to the worktree. Its recorded state is dropped
+    # meanwhile and brought up to date afterwards (see worktree_index)
+    index_entry = get_current_entry(student_dir)
+    invalidate(student_dir)
+    student_results: StudentResults = {}
+
     student_results["name"] = student_name
     student_results["dir_name"] = dir_name
     if assignment:
@@ -154,8 +349,16 @@ def eval_assignment(
                 return None
 
             self_email = GitRepo.get_user_email()
-            commits: list[Commit] = []
-            for commit in repo.get_commits():
+            commits: list[LogCommit] = []
+            history = get_cached_commits_until(
+                Path.cwd().parent,
+                Path.cwd().name,
+                f"eval_assignment:{self_email}",
+                lambda c: c.author_email != self_email
+                and c.author_name
+                and "github-classroom" in c.author_name,
+            )
+            for commit in history:
                 # Skip the evaluator...best effort
                 if commit.author_email == self_email:
                     continue
@@ -191,6 +394,7 @@ def eval_assignment(
     draw_single_line("pytest")
 
     pytest_reporter = PytestResultsReporter()
+    limits_plugin = LimitsPlugin(limits)
 
     keep_packages = [
         "_asyncio",
@@ -221,11 +425,13 @@ def eval_assignment(
 
     try:
         # run the tests and report
-        pytest.main(
-            # ["--tb=no", "-q", "--timeout=1"],
-            [],
-            plugins=[pytest_reporter],
-        )
+        with process_limits(limits):
+            pytest.main(
+                limits.pytest_args(),
+                plugins=[pytest_reporter, limits_plugin],
+            )
+        if limits_plugin.breach:
+            pytest_reporter.record_error(limits_plugin.breach)
 
         pytest_pct = round(pytest_reporter.results.pass_pct, 3)
         student_results["pytest_pct"] = pytest_pct
@@ -236,15 +442,17 @@ def eval_assignment(
         logger.exception("Unexpected error running pytest")
 
     finally:
-        posttest_modules = [key for key in sys.modules.keys()]
-        for module_name in posttest_modules:
-            if module_name in pretest_modules:
-                continue
-            package = module_name.split(".")[0]
-            if package in keep_packages:
-                continue
-            del sys.modules[module_name]
-        sys.path = pretest_path.copy()
+        # An isolated worker process exits after this student anyway
+        if not isolated:
+            posttest_modules = [key for key in sys.modules.keys()]
+            for module_name in posttest_modules:
+                if module_name in pretest_modules:
+                    continue
+                package = module_name.split(".")[0]
+                if package in keep_packages:
+                    continue
+                del sys.modules[module_name]
+            sys.path = pretest_path.copy()
 
     ###############################################################################
     # PYLINT
@@ -271,35 +479,8 @@ def eval_assignment(
     if lint_files:
         print("Testing", *lint_filenames)
 
-        lint_disabled = [
-            "invalid-name",
-            "missing-module-docstring",
-            "missing-class-docstring",
-            "missing-function-docstring",
-            "trailing-whitespace",
-            "missing-final-newline",
-            "trailing-newlines",
-            "unnecessary-negation",
-            "wrong-import-order",
-            "duplicate-code",
-            "too-few-public-methods",
-            "too-many-arguments",
-            "too-many-locals",
-            "too-many-statements",
-            "bare-except",
-            "f-string-without-interpolation",
-            "chained-comparison",
-            "consider-using-sys-exit",
-            "singleton-comparison",
-            "consider-using-max-builtin",
-            # 'bad-indentation',
-            "redefined-outer-name",
-            "simplifiable-if-statement",
-            "no-else-return",
-            "inconsistent-return-statements",
-        ]
         lint_args = []
-        lint_args += ["--disable=" + ",".join(lint_disabled)]
+        lint_args += ["--disable=" + ",".join(LINT_DISABLED)]
         lint_args += lint_files
         pylint_output = StringIO()  # Custom open stream
         pylint_reporter = JSON2Reporter(pylint_output)
@@ -321,8 +502,10 @@ def eval_assignment(
     # Save and return the test results data
     ###############################################################################
 
-    with open(RESULTS_FILE_NAME, "w") as fi:
-        json.dump(student_results, fi, indent=2, default=_json_serialize)
+    if eval_key:
+        student_results["eval_key"] = eval_key
+    save_student_results(student_dir, student_results)
+    record_writes(student_dir, index_entry)
 
     return student_results
 
@@ -0,0 +1,289 @@
+from collections import deque
+from dataclasses import dataclass
+from multiprocessing.connection import Connection, wait
+from multiprocessing.context import BaseContext
+from multiprocessing.process import BaseProcess
+from pathlib import Path
+from typing import Any, Iterable
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+import tempfile
+import time
+
+from au.classroom import Assignment
+
+from .eval_assignment import eval_assignment, save_student_results
+from .limits import EvalLimits
+from .pytest_data import Results
+from .types import StudentResults
+
+
+logger = logging.getLogger(__name__)
+
+
+# Imported once by the forkserver so each worker forked from it starts with
+# them loaded. Importing this module pulls in eval_assignment and au as well.
+PRELOAD_MODULES = ["pytest", "pylint.lint", "astroid", __name__]
+
+
+# How much longer than --time-limit a worker may run (git checks, pylint, ...)
+# before it is killed
+KILL_GRACE = 60.0
+
+EvalResult = tuple[StudentResults | None, str]
+
+
+def _get_context(preload: Iterable[str]) -> BaseContext:
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Modules that fail to import are skipped by the forkserver
+        context.set_forkserver_preload([*PRELOAD_MODULES, *preload])
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def _run_worker(conn: Connection, args: tuple, kwargs: dict) -> None:
+    try:
+        conn.send(eval_in_worker(*args, **kwargs))
+    finally:
+        conn.close()
+
+
+@dataclass
+class _Worker:
+    process: BaseProcess
+    conn: Connection
+    started: float
+
+
+class EvalPool:
+    """
+    Runs eval_in_worker for each submitted student in a process of its own,
+    at most `jobs` at a time, so nothing a student's code imports or changes
+    (modules, cwd, globals, rlimits) can leak into the next student.
+
+    Where available, workers are forked from a forkserver that has already
+    imported PRELOAD_MODULES and `preload` (e.g., the instructor's test
+    dependencies), so they don't pay for those imports per student.
+    Elsewhere, workers are spawned and import everything themselves.
+
+    A worker still running kill_after seconds after it started is killed, so
+    a runaway student can't hold up the rest of the class. The result of a
+    worker that was killed, or died, is an exception whose message says so
+    (mentioning "limit exceeded" if a resource limit was the likely cause).
+    """
+
+    def __init__(
+        self, jobs: int, preload: Iterable[str] = (), kill_after: float | None = None
+    ):
+        self.jobs = max(1, jobs)
+        self.kill_after = kill_after
+        self._context = _get_context(preload)
+        self._pending: deque[tuple[str, tuple, dict]] = deque()
+        self._running: dict[str, _Worker] = {}
+        self._done: dict[str, Any] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def submit(self, key: str, *args, **kwargs) -> None:
+        """Queue eval_in_worker(*args, **kwargs), identified by key."""
+        self._pending.append((key, args, kwargs))
+
+    def result(self, key: str) -> EvalResult:
+        """
+        Wait for the result of key, keeping the workers busy in the meantime.
+        Raises if the worker was killed or died without returning one.
+        """
+        while key not in self._done:
+            self._start_workers()
+            self._wait()
+        result = self._done.pop(key)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def close(self) -> None:
+        """Kill any running workers and forget pending ones."""
+        self._pending.clear()
+        for worker in self._running.values():
+            worker.process.kill()
+            worker.process.join()
+            worker.conn.close()
+        self._running.clear()
+
+    def _start_workers(self) -> None:
+        while self._pending and len(self._running) < self.jobs:
+            key, args, kwargs = self._pending.popleft()
+            conn, child_conn = self._context.Pipe(duplex=False)
+            process = self._context.Process(
+                target=_run_worker, args=(child_conn, args, kwargs), name=key
+            )
+            process.start()
+            child_conn.close()
+            self._running[key] = _Worker(process, conn, time.monotonic())
+
+    def _wait(self) -> None:
+        if not self._running:
+            raise KeyError("No such evaluation was submitted")
+        timeout = None
+        if self.kill_after:
+            first_deadline = min(w.started for w in self._running.values())
+            timeout = max(0, first_deadline + self.kill_after - time.monotonic())
+
+        ready = wait([w.conn for w in self._running.values()], timeout)
+        for key, worker in list(self._running.items()):
+            if worker.conn in ready:
+                try:
+                    self._done[key] = worker.conn.recv()
+                except EOFError:
+                    worker.process.join()
+                    self._done[key] = _exit_error(worker.process.exitcode)
+            elif (
+                self.kill_after and time.monotonic() - worker.started >= self.kill_after
+            ):
+                logger.warning(f"Killing the evaluation of {key}")
+                worker.process.kill()
+                self._done[key] = TimeoutError(
+                    f"Time limit exceeded: evaluation killed after {self.kill_after:g}s"
+                )
+            else:
+                continue
+            worker.process.join()
+            worker.conn.close()
+            del self._running[key]
+
+
+def _exit_error(exitcode: int | None) -> RuntimeError:
+    if exitcode is not None and exitcode < 0:
+        # e.g., SIGXCPU from RLIMIT_CPU or SIGKILL from the OOM killer
+        try:
+            name = signal.Signals(-exitcode).name
+        except ValueError:
+            name = f"signal {-exitcode}"
+        return RuntimeError(f"Resource limit exceeded: worker killed by {name}")
+    return RuntimeError(f"Worker exited unexpectedly ({exitcode})")
+
+
+def failed_results(
+    student_dir: Path,
+    student_name: str | None,
+    assignment: Assignment | None,
+    message: str,
+) -> StudentResults:
+    """
+    Results recording message as the error of the whole test run, for a
+    student whose worker never returned any (see EvalPool). They are saved
+    like eval_assignment's, but with no eval_key, so the student is evaluated
+    again next time.
+    """
+    pytest_results = Results()
+    pytest_results.error(message)
+    student_results: StudentResults = {
+        "name": student_name or student_dir.name,
+        "dir_name": student_dir.name,
+        "pytest_pct": 0.0,
+        "pytest_results": pytest_results.as_dict(),
+    }
+    if assignment:
+        student_results["assignment_title"] = assignment.title
+        student_results["assignment_deadline"] = assignment.deadline
+    try:
+        save_student_results(student_dir, student_results)
+    except OSError:
+        logger.exception(f"Unable to save the results for {student_dir.name}")
+    return student_results
+
+
+def eval_isolated(
+    student_dir: Path,
+    student_name: str | None,
+    assignment: Assignment | None = None,
+    no_git: bool = False,
+    force: bool = False,
+    limits: EvalLimits | None = None,
+) -> StudentResults | None:
+    """
+    Run eval_assignment for one student in a worker process, which is how
+    limits are enforced, printing its output. A worker that has to be killed
+    still gets results (see failed_results).
+    """
+    kill_after = None
+    if limits and limits.wall_time:
+        kill_after = limits.wall_time + KILL_GRACE
+    with EvalPool(1, kill_after=kill_after) as pool:
+        pool.submit(
+            student_dir.name,
+            student_dir,
+            student_name,
+            assignment,
+            no_git,
+            force,
+            limits,
+            log_level=logging.getLogger().getEffectiveLevel(),
+        )
+        try:
+            student_results, output = pool.result(student_dir.name)
+        except (TimeoutError, RuntimeError) as ex:
+            logger.error(f"Unable to evaluate {student_dir.name}: {ex}")
+            return failed_results(student_dir, student_name, assignment, str(ex))
+    print(output, end="")
+    return student_results
+
+
+def eval_in_worker(
+    student_dir: Path,
+    student_name: str | None,
+    assignment: Assignment | None = None,
+    no_git: bool = False,
+    force: bool = False,
+    limits: EvalLimits | None = None,
+    log_level: int = logging.INFO,
+) -> EvalResult:
+    """
+    Run eval_assignment in this (worker) process, capturing everything written
+    to stdout/stderr, including by pytest, pylint and git. Returns the results
+    and the captured output, to be printed by the parent in a sensible order.
+    """
+    logging.basicConfig(level=log_level)
+    with tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace") as output:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        saved_fds = os.dup(1), os.dup(2)
+        os.dup2(output.fileno(), 1)
+        os.dup2(output.fileno(), 2)
+        try:
+            student_results = eval_assignment(
+                student_dir,
+                student_name,
+                assignment,
+                no_git,
+                force,
+                limits,
+                isolated=True,
+            )
+        except Exception:
+            logger.exception(f"Unexpected error evaluating {student_dir.name}")
+            student_results = None
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            for fd, saved_fd in zip((1, 2), saved_fds):
+                os.dup2(saved_fd, fd)
+                os.close(saved_fd)
+        output.seek(0)
+        captured = output.read()
+
+    # Exceptions recorded in the results may not survive pickling
+    if student_results:
+        student_results = {
+            key: repr(value) if isinstance(value, BaseException) else value
+            for key, value in student_results.items()
+        }
+    return student_results, captured
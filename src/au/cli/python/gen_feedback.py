@@ -7,6 +7,7 @@ from pprint import pformat
 import click
 
 from au.click import BasePath, DebugOptions
+from au.common.worktree_index import get_current_entry, invalidate, record_writes
 
 from .eval_assignment import retrieve_student_results
 from .pytest_data import Results, Test, SubTest
@@ -123,6 +124,10 @@ def gen_feedback(
     scores = get_student_scores(student_results, scoring_params)
     final_score_row = get_summary_row("Final Score", f"{scores.overall_score:g}")
 
+    # Forgotten while writing, then brought up to date, so commit-all knows
+    # the feedback is there to commit without running git status
+    index_entry = get_current_entry(student_dir)
+    invalidate(student_dir)
     with open(feedback_file_path, "w") as fi:
 
         def wl(txt=""):
@@ -215,6 +220,8 @@ def gen_feedback(
             # wl(pformat(student_results['pylint_results']))
             wl("```")
 
+    record_writes(student_dir, index_entry)
+
 
 if __name__ == "__main__":
     gen_feedback_cmd()
@@ -0,0 +1,201 @@
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator
+import functools
+import logging
+import signal
+import time
+
+import click
+import pytest
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class EvalLimits:
+    """Resource limits for evaluating one student (None means no limit)."""
+
+    # Wall-clock seconds for each test (enforced by pytest-timeout)
+    test_timeout: float | None = None
+    # Wall-clock seconds for all of a student's tests
+    wall_time: float | None = None
+    # CPU seconds for all of a student's tests
+    cpu_time: float | None = None
+    # Address space of the process running the tests, in MB
+    memory_mb: int | None = None
+
+    @property
+    def enabled(self) -> bool:
+        return any([self.test_timeout, self.wall_time, self.cpu_time, self.memory_mb])
+
+    def pytest_args(self) -> list[str]:
+        if not self.test_timeout:
+            return []
+        return [
+            f"--timeout={self.test_timeout:g}",
+            f"--timeout-method={_TIMEOUT_METHOD}",
+        ]
+
+
+# SIGALRM interrupts even a test stuck in a loop; elsewhere pytest-timeout can
+# only end the whole process
+_TIMEOUT_METHOD = "signal" if hasattr(signal, "SIGALRM") else "thread"
+
+
+class EvalLimitsOptions:
+    """
+    Adds the resource limit options to a command. The wrapped function
+    receives them as a single EvalLimits `limits`.
+    """
+
+    def options(self, func):
+        @click.option(
+            "--timeout",
+            type=click.FloatRange(min=0, min_open=True),
+            metavar="SECONDS",
+            help="the wall-clock time limit for each test",
+        )
+        @click.option(
+            "--time-limit",
+            type=click.FloatRange(min=0, min_open=True),
+            metavar="SECONDS",
+            help="the wall-clock time limit for all of a student's tests",
+        )
+        @click.option(
+            "--cpu-limit",
+            type=click.FloatRange(min=0, min_open=True),
+            metavar="SECONDS",
+            help="the CPU time limit for all of a student's tests",
+        )
+        @click.option(
+            "--memory-limit",
+            type=click.IntRange(min=1),
+            metavar="MB",
+            help="the memory (address space) limit for the process running a "
+            "student's tests",
+        )
+        @functools.wraps(func)
+        def command_wrapper(*args, **kwargs):
+            kwargs["limits"] = EvalLimits(
+                test_timeout=kwargs.pop("timeout", None),
+                wall_time=kwargs.pop("time_limit", None),
+                cpu_time=kwargs.pop("cpu_limit", None),
+                memory_mb=kwargs.pop("memory_limit", None),
+            )
+            return func(*args, **kwargs)
+
+        return command_wrapper
+
+
+class LimitsPlugin:
+    """
+    pytest plugin that holds a student's tests to the wall-clock and CPU time
+    allowed by limits, failing the test that runs out of either and stopping
+    the test run there.
+
+    Each test's pytest-timeout is cut down to the wall-clock time left, and
+    the CPU time is enforced by RLIMIT_CPU (see process_limits), whose
+    SIGXCPU fails the running test.
+    """
+
+    def __init__(self, limits: EvalLimits):
+        self.limits = limits
+        self.breach: str | None = None
+        self._session = None
+        self._item = None
+        self._started = time.monotonic()
+
+    def pytest_sessionstart(self, session):
+        self._session = session
+        self._started = time.monotonic()
+        if self.limits.cpu_time and hasattr(signal, "SIGXCPU"):
+            signal.signal(signal.SIGXCPU, self._on_cpu_limit)
+
+    def pytest_sessionfinish(self, session):
+        # Still over the limit until process_limits lifts it, and SIGXCPU would
+        # otherwise end the process
+        if self.limits.cpu_time and hasattr(signal, "SIGXCPU"):
+            signal.signal(signal.SIGXCPU, signal.SIG_IGN)
+
+    # Runs ahead of pytest-timeout's own wrapper, which reads the marker
+    @pytest.hookimpl(wrapper=True, tryfirst=True)
+    def pytest_runtest_protocol(self, item, nextitem):
+        if self.limits.wall_time:
+            elapsed = time.monotonic() - self._started
+            remaining = max(0.1, round(self.limits.wall_time - elapsed, 1))
+            if not self.limits.test_timeout or remaining < self.limits.test_timeout:
+                item.add_marker(pytest.mark.timeout(remaining, method=_TIMEOUT_METHOD))
+        self._item = item
+        try:
+            return (yield)
+        finally:
+            self._item = None
+
+    def pytest_runtest_logfinish(self, nodeid, location):
+        if self.limits.wall_time:
+            if time.monotonic() - self._started >= self.limits.wall_time:
+                self._stop(f"Time limit exceeded ({self.limits.wall_time:g}s)")
+
+    def _on_cpu_limit(self, signum, frame):
+        __tracebackhide__ = True
+        # Sent every second once over the limit; fail the running test once
+        item = self._item
+        if not item or getattr(item, "_au_cpu_limit", False):
+            return
+        item._au_cpu_limit = True
+        message = f"CPU time limit exceeded ({self.limits.cpu_time:g}s)"
+        self._stop(message)
+        pytest.fail(message)
+
+    def _stop(self, breach: str) -> None:
+        if self.breach:
+            return
+        # pytest checks shouldstop after each test and ends the run if set
+        self.breach = breach
+        logger.warning(breach)
+        if self._session:
+            self._session.shouldstop = breach
+
+
+@contextmanager
+def process_limits(limits: EvalLimits) -> Iterator[None]:
+    """
+    Apply the memory (RLIMIT_AS) and CPU time (RLIMIT_CPU) limits to this
+    process while in the with block. Only for a process of its own (see
+    eval_worker): a student's code that ignores SIGXCPU and keeps running is
+    left to the parent to kill.
+
+    Allocations beyond limits.memory_mb fail with MemoryError, and going over
+    limits.cpu_time sends SIGXCPU (see LimitsPlugin). The previous limits are
+    restored afterwards.
+    """
+    if not resource:
+        yield
+        return
+    saved = {}
+
+    def lower(which: int, value: int) -> None:
+        soft, hard = saved[which] = resource.getrlimit(which)
+        if hard != resource.RLIM_INFINITY:
+            value = min(value, hard)
+        resource.setrlimit(which, (value, hard))
+
+    if limits.memory_mb:
+        lower(resource.RLIMIT_AS, limits.memory_mb * 1024 * 1024)
+    if limits.cpu_time:
+        # RLIMIT_CPU counts this process's CPU time from the start
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        used = usage.ru_utime + usage.ru_stime
+        lower(resource.RLIMIT_CPU, int(used + limits.cpu_time) + 1)
+    try:
+        yield
+    finally:
+        for which, limit in saved.items():
+            resource.setrlimit(which, limit)
@@ -4,6 +4,11 @@ from pytest import TestReport
 from .pytest_data import Results, NodeId, TestClass, Test, SubTest
 
 
+# Failures caused by a resource limit (see limits.py) rather than by the code
+# being wrong; they are recorded as errors
+LIMIT_FAILURES = ("Timeout (>", "MemoryError", "limit exceeded")
+
+
 class PytestResultsReporter:
     """
     Custom results reporter that formats results as JSON suitable for reporting
@@ -14,6 +19,8 @@ class PytestResultsReporter:
         self.results = Results()
         self.last_err = None
         self.config = None
+        self.collected: list[str] = []
+        self.reported: set[str] = set()
 
     # def pytest_report_teststatus(self, report: TestReport):
     #     '''
@@ -45,6 +52,8 @@ class PytestResultsReporter:
         Process a test setup / call / teardown report.
         """
 
+        self.reported.add(report.nodeid)
+
         # ignore successful setup and teardown stages
         if report.passed and report.when != "call":
             return
@@ -79,12 +88,26 @@ class PytestResultsReporter:
                 crash = report.longrepr.reprcrash
                 message = self._make_message(trace, crash)
 
-            # test failed due to a setup / teardown error
-            if report.when != "call":
+            # test failed due to a setup / teardown error or a resource limit
+            if report.when != "call" or self._is_limit_failure(message):
                 state.error(message)
             else:
                 state.fail(message)
 
+    def pytest_collection_finish(self, session):
+        """Remember which tests are to be run."""
+        self.collected = [item.nodeid for item in session.items]
+
+    def record_error(self, message: str) -> None:
+        """
+        Record a problem that ended the test run early (e.g., exceeding a
+        resource limit) as an error on every test that didn't get to run.
+        """
+        for nodeid in self.collected:
+            if nodeid not in self.reported:
+                self.results.get_test(nodeid).error(message)
+        self.results.error(message)
+
     def pytest_sessionfinish(self, session, exitstatus):
         """Processes the results into a report."""
         exitcode = pytest.ExitCode(int(exitstatus))
@@ -112,6 +135,9 @@ class PytestResultsReporter:
             crash = err.chain[0][1]
             self.last_err = self._make_message(trace, crash)
 
+    def _is_limit_failure(self, message: str | None) -> bool:
+        return bool(message) and any(text in message for text in LIMIT_FAILURES)
+
     def _make_message(self, trace, crash):
         """Make a formatted message for reporting."""
         if crash:
@@ -7,17 +7,26 @@ from rich.console import Console
 
 from git_wrap import get_git_dirs
 
-from au.click import BasePath, AssignmentOptions, RosterOptions, DebugOptions
+from au.click import (
+    BasePath,
+    AssignmentOptions,
+    CacheOptions,
+    RosterOptions,
+    DebugOptions,
+    JobsOptions,
+)
 from au.classroom import Assignment, Roster
 from au.common import draw_double_line, draw_single_line
 
 from .eval_assignment import retrieve_student_results, eval_assignment
+from .eval_worker import KILL_GRACE, EvalPool, failed_results
 from .gen_feedback import (
     gen_feedback,
     get_summary,
     ScoringParams,
     DEFAULT_FEEDBACK_FILE_NAME,
 )
+from .limits import EvalLimits, EvalLimitsOptions
 
 
 logger = logging.getLogger(__name__)
@@ -25,6 +34,7 @@ logger = logging.getLogger(__name__)
 
 @click.command()
 @click.argument("root_dir", type=BasePath(), default=".")
+@CacheOptions().options
 @AssignmentOptions().options
 @RosterOptions(prompt=True).options
 @click.option(
@@ -70,6 +80,21 @@ logger = logging.getLogger(__name__)
     show_default=True,
     help="the weight to apply to pylint when calculating the overall score (0 to 1)",
 )
+@click.option(
+    "--force",
+    is_flag=True,
+    help="set to evaluate every student again, even those whose results are "
+    "already up to date",
+)
+@click.option(
+    "--preload",
+    multiple=True,
+    metavar="MODULE",
+    help="a module the tests depend on to import once up front rather than for "
+    "every student when using --jobs (repeatable)",
+)
+@EvalLimitsOptions().options
+@JobsOptions(default=1).options
 @DebugOptions().options
 def quick_grade(
     root_dir: Path,
@@ -82,6 +107,10 @@ def quick_grade(
     max_score: int = 10,
     pytest_weight: float = 1.0,
     pylint_weight: float = 0.0,
+    force: bool = False,
+    preload: tuple[str, ...] = (),
+    limits: EvalLimits | None = None,
+    jobs: int = 1,
     **kwargs,
 ) -> None:
     """Run tests and generate feedback for all subdirectories of ROOT_DIR.
@@ -93,6 +122,16 @@ def quick_grade(
             au python eval-assignment SUBDIR
             au python gen-feedback SUBDIR
 
+    With --jobs greater than 1, or any resource limit, each student is
+    evaluated in a separate worker process, several at a time. Output is still
+    printed one student at a time, in directory order. A worker that is still
+    running well past --time-limit is killed, and its student's results record
+    the limit as an error.
+
+    Students whose results are already up to date (nothing they depend on has
+    changed since they were evaluated) are not evaluated again unless --force
+    is given.
+
     If ROOT_DIR is not provided, then the current working directory will be
     assumed.
     """
@@ -138,58 +177,100 @@ def quick_grade(
 
     print(f"Processing {len(student_repos)} assignment directories")
 
-    for student_repo in student_repos:
-
-        print()
-        dir_name = student_repo.name
-
-        if dir_name[0] in "._":
-            print(f"SKIPPING {dir_name}: hidden or special directory")
-            continue
-
-        draw_double_line(f"Processing {dir_name}")
-
-        student_name = None
+    def get_student_name(dir_name: str) -> str | None:
         if dir_student_map and dir_name in dir_student_map:
-            student_name = dir_student_map[dir_name]
-
-        dir_path = (root_dir / student_repo).resolve()
-        if skip_eval:
-            try:
-                student_results = retrieve_student_results(dir_path)
-            except:
-                print(
-                    f"SKIPPING: No results file found. Have you run ay python eval-assignment yet?"
-                )
+            return dir_student_map[dir_name]
+        return None
+
+    # Start evaluating every student in worker processes up front, then report
+    # on them in order as their results come in
+    pool: EvalPool | None = None
+    evaluations: set[str] = set()
+    if (jobs > 1 or (limits and limits.enabled)) and not skip_eval:
+        kill_after = None
+        if limits and limits.wall_time:
+            kill_after = limits.wall_time + KILL_GRACE
+        pool = EvalPool(jobs, preload, kill_after)
+        for student_repo in student_repos:
+            if student_repo.name[0] in "._":
                 continue
-        else:
-            student_results = eval_assignment(dir_path, student_name, assignment)
-
-        if not student_results:
-            continue
-
-        if not skip_feedback:
-            draw_single_line(f"Generating {feedback_filename}")
-
-            try:
-                scoring_params = ScoringParams(max_score, pytest_weight, pylint_weight)
-                gen_feedback(
-                    student_results,
-                    student_repo,
-                    feedback_filename,
-                    scoring_params,
-                    overwrite_feedback,
-                )
-            except:
-                logging.exception(
-                    "An unexpected error occurred generating {student_repo / feedback_filename}"
+            evaluations.add(student_repo.name)
+            pool.submit(
+                student_repo.name,
+                (root_dir / student_repo).resolve(),
+                get_student_name(student_repo.name),
+                assignment,
+                force=force,
+                limits=limits,
+                log_level=logging.getLogger().getEffectiveLevel(),
+            )
+
+    try:
+        for student_repo in student_repos:
+            print()
+            dir_name = student_repo.name
+
+            if dir_name[0] in "._":
+                print(f"SKIPPING {dir_name}: hidden or special directory")
+                continue
+
+            draw_double_line(f"Processing {dir_name}")
+
+            student_name = get_student_name(dir_name)
+
+            dir_path = (root_dir / student_repo).resolve()
+            if skip_eval:
+                try:
+                    student_results = retrieve_student_results(dir_path)
+                except:
+                    print(
+                        f"SKIPPING: No results file found. Have you run ay python eval-assignment yet?"
+                    )
+                    continue
+            elif dir_name in evaluations:
+                try:
+                    student_results, output = pool.result(dir_name)
+                    print(output, end="")
+                except (TimeoutError, RuntimeError) as ex:
+                    logger.error(f"Unable to evaluate {dir_name}: {ex}")
+                    student_results = failed_results(
+                        dir_path, student_name, assignment, str(ex)
+                    )
+            else:
+                student_results = eval_assignment(
+                    dir_path, student_name, assignment, force=force, limits=limits
                 )
 
-                print(f"done generating {feedback_filename}")
+            if not student_results:
+                continue
 
-        print(get_summary(student_results, scoring_params))
-        draw_double_line()
-        print()
+            if not skip_feedback:
+                draw_single_line(f"Generating {feedback_filename}")
+
+                try:
+                    scoring_params = ScoringParams(
+                        max_score, pytest_weight, pylint_weight
+                    )
+                    gen_feedback(
+                        student_results,
+                        student_repo,
+                        feedback_filename,
+                        scoring_params,
+                        overwrite_feedback,
+                    )
+                except:
+                    logging.exception(
+                        "An unexpected error occurred generating {student_repo / feedback_filename}"
+                    )
+
+                    print(f"done generating {feedback_filename}")
+
+            print(get_summary(student_results, scoring_params))
+            draw_double_line()
+            print()
+    finally:
+        if pool:
+            pool.close()
 
 
 if __name__ == "__main__":
@@ -6,12 +6,13 @@ import click
 
 from git_wrap import GitRepo
 from au.classroom import gh, gh_api, choose_classroom, get_classroom, choose_assignment
-from au.click import BasePath
+from au.click import BasePath, CacheOptions
 from au.common import get_double_line
 
 
 @click.command()
 @click.argument("path", type=BasePath(resolve_path=True, exists=False))
+@CacheOptions().options
 @click.option(
     "--classroom-id",
     type=int,
@@ -1,24 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
 import logging
+import os
+import subprocess
+import sys
+import time
 from pathlib import Path
 
 import click
 from rich.console import Console
 
-from git_wrap import GitRepo, get_git_dirs
-from git_wrap.git_repo import GitCommandError
-from au.click import BasePath
+from craftable import get_table
+from craftable.styles import BasicScreenStyle
+from git_wrap import get_git_dirs
+from au.click import BasePath, JobsOptions
 from au.common import draw_double_line
 
 
 logger = logging.getLogger(__name__)
 
+# Messages of git failing because it needed credentials it couldn't prompt for
+_AUTH_ERRORS = (
+    "terminal prompts disabled",
+    "could not read username",
+    "could not read password",
+    "authentication failed",
+    "permission denied (publickey)",
+)
 
-@click.command()
+
+@dataclass
+class _GitResult:
+    repo_dir: Path
+    returncode: int = -1
+    stdout: str = ""
+    stderr: str = ""
+    elapsed: float = 0.0
+
+    @property
+    def auth_failed(self) -> bool:
+        stderr = self.stderr.lower()
+        return self.returncode != 0 and any(e in stderr for e in _AUTH_ERRORS)
+
+
+def _run_git(
+    repo_dir: Path, command: tuple[str, ...], env: dict[str, str] | None = None
+) -> _GitResult:
+    result = _GitResult(repo_dir)
+    start = time.monotonic()
+    try:
+        process = subprocess.run(
+            ["git", *command], cwd=repo_dir, capture_output=True, text=True, env=env
+        )
+        result.returncode = process.returncode
+        result.stdout = process.stdout
+        result.stderr = process.stderr
+    except Exception as ex:
+        result.stderr = str(ex)
+    result.elapsed = time.monotonic() - start
+    return result
+
+
+@click.command(
+    context_settings={"ignore_unknown_options": True, "allow_interspersed_args": False},
+    options_metavar="[OPTIONS (before ROOT_DIR)]",
+)
+@JobsOptions().options
+@click.option(
+    "--as-completed",
+    "as_completed_order",
+    is_flag=True,
+    help="set to print each repository's output as soon as it finishes rather "
+    "than in directory order",
+)
 @click.argument("root_dir", type=BasePath())
 @click.argument("command", type=click.UNPROCESSED, nargs=-1)
 def recursive_git(
     root_dir: Path,
-    command: str,
+    command: tuple[str, ...],
+    as_completed_order: bool = False,
+    jobs: int = 1,
+    **kwargs,
 ) -> None:
     """Run a git COMMAND on all repositories in ROOT_DIR.
 
@@ -26,40 +88,103 @@ def recursive_git(
     .git subdirectory) and run the specified git COMMAND in each repository.
 
     COMMAND:
-    
+
      - should be a valid git command, such as 'status', 'pull', 'fetch', etc.
      - should NOT include the 'git' prefix
      - is executed after changing directory to each repository
      - all arguments after COMMAND are passed directly to git
+
+    Options for this command (such as --jobs) must come BEFORE ROOT_DIR. Anything
+    after ROOT_DIR, options included, is part of COMMAND and is passed to git:
+
+    \b
+        au repo recursive-git --jobs 4 . status   # 4 jobs, runs `git status`
+        au repo recursive-git . --jobs 4 status   # runs `git --jobs 4 status`
+
+    Repositories are processed concurrently (see --jobs). The output of each is
+    buffered and printed in directory order (or as each finishes with
+    --as-completed), followed by a summary. The exit code is non-zero if the
+    command failed in any repository.
+
+    Concurrent prompts for credentials would interleave, so with more than one
+    job git is told not to prompt; repositories that needed credentials are
+    reported as such. Use --jobs 1 to be prompted.
     """
     logging.basicConfig()
 
     console = Console()
     with console.status(
-        status="Finding repositories in {root_dir}", spinner="bouncingBall"
+        status=f"Finding repositories in {root_dir}", spinner="bouncingBall"
     ):
         repo_dirs = get_git_dirs(root_dir)
 
     print(f"Processing {len(repo_dirs)} repositories")
 
-    for repo_dir in repo_dirs:
-
-        print()
-        dir_name = repo_dir.name
-
-        draw_double_line(f"Processing {dir_name}")
-        print("> git", *command)
-
-        try:
-            result = GitRepo.git(*command, path=repo_dir)
-            if result:
-                if result.stdout:
-                    print(result.stdout)
-                if result.stderr:
-                    print(result.stderr)
-        except GitCommandError:
-            pass # Already logged
-        except Exception:
-            logger.exception(
-                "Failed to run 'git {command}' in {dir_name}"
+    env = None if jobs == 1 else os.environ | {"GIT_TERMINAL_PROMPT": "0"}
+    results: list[_GitResult] = []
+    with ThreadPoolExecutor(max_workers=max(1, jobs)) as executor:
+        futures = [
+            executor.submit(_run_git, repo_dir, command, env) for repo_dir in repo_dirs
+        ]
+        finished = as_completed(futures) if as_completed_order else futures
+        for future in finished:
+            result = future.result()
+            results.append(result)
+            _print_result(result, command)
+
+    failures = [r for r in results if r.returncode != 0]
+    auth_failures = [r for r in failures if r.auth_failed]
+    rows = [
+        [
+            r.repo_dir.name,
+            _get_status(r),
+            r.returncode,
+            f"{r.elapsed:.2f}s",
+        ]
+        for r in sorted(results, key=lambda r: r.repo_dir.name)
+    ]
+    print()
+    if rows:
+        print(
+            get_table(
+                rows,
+                header_row=["REPOSITORY", "STATUS", "EXIT", "TIME"],
+                style=BasicScreenStyle(),
             )
+        )
+    summary = [
+        ["Succeeded", len(results) - len(failures)],
+        ["Failed", len(failures)],
+    ]
+    if auth_failures:
+        summary.append(["Authentication Failed", len(auth_failures)])
+    print(get_table(summary, style=BasicScreenStyle()))
+    if auth_failures and env:
+        logger.error(
+            f"git needed credentials in {len(auth_failures)} repositories; "
+            "run with --jobs 1 to be prompted for them"
+        )
+
+    if failures:
+        sys.exit(1)
+
+
+def _get_status(result: _GitResult) -> str:
+    if result.returncode == 0:
+        return "OK"
+    return "AUTH FAILED" if result.auth_failed else "FAILED"
+
+
+def _print_result(result: _GitResult, command: tuple[str, ...]) -> None:
+    print()
+    draw_double_line(f"Processing {result.repo_dir.name}")
+    print("> git", *command)
+    if result.stdout:
+        print(result.stdout)
+    if result.stderr:
+        print(result.stderr)
+    if result.returncode != 0:
+        logger.error(
+            f"'git {' '.join(command)}' failed in {result.repo_dir.name} "
+            f"(exit code {result.returncode})"
+        )
@@ -1,5 +1,7 @@
 import click
 
+from au.classroom import RateLimitError
+
 
 class AliasedGroup(click.Group):
     def get_command(self, ctx, cmd_name):
@@ -17,3 +19,10 @@ class AliasedGroup(click.Group):
         # always return the full command name
         _, cmd, args = super().resolve_command(ctx, args)
         return cmd.name, cmd, args
+
+    def invoke(self, ctx):
+        try:
+            return super().invoke(ctx)
+        except RateLimitError as ex:
+            # An error to report, not a crash: just when to try again
+            raise click.ClickException(str(ex)) from ex
@@ -8,7 +8,9 @@ from au.classroom import (
     Assignment,
     choose_assignment,
     choose_classroom,
+    clear_prefetched,
     get_assignment,
+    prefetch_accepted_assignments,
 )
 
 logger = logging.getLogger(__name__)
@@ -21,11 +23,19 @@ class AssignmentOptions:
         store: bool = True,
         force_store: bool = False,
         required: bool = False,
+        prefetch_accepted: bool = False,
+        prefetch_needs_roster: bool = False,
     ):
         self.load = load
         self.store = store
         self.force_store = force_store
         self.required = required
+        # Start retrieving accepted assignments in the background so they are
+        # ready by the time any remaining prompts have been answered.
+        self.prefetch_accepted = prefetch_accepted
+        # Only prefetch them if a roster (--roster or settings) is configured,
+        # for commands that only need them to match logins to a roster.
+        self.prefetch_needs_roster = prefetch_needs_roster
 
     def get_settings(self):
         ctx = click.get_current_context()
@@ -41,6 +51,17 @@ class AssignmentOptions:
                         return AssignmentSettings(base_path, create=True)
         return None
 
+    def should_prefetch_accepted(self, assignment, settings, kwargs) -> bool:
+        if not self.prefetch_accepted:
+            return False
+        if not self.prefetch_needs_roster:
+            return True
+        # Rosters are only used with individual assignments. RosterOptions
+        # (applied below this) hasn't replaced --roster with a Roster yet.
+        if assignment.type != "individual":
+            return False
+        return bool(kwargs.get("roster") or (settings and settings.roster_file))
+
     def options(self, func):
         help_text = "The integer id for the assignment."
         if self.load:
@@ -54,6 +75,8 @@ class AssignmentOptions:
         @click.option("--assignment-id", type=int, help=help_text)
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
+            # Results prefetched for this command are no use to the next one
+            click.get_current_context().call_on_close(clear_prefetched)
             kwargs["assignment"] = None  # default to None, but set below
             settings = self.get_settings()
             assignment_id: int = None
@@ -75,6 +98,8 @@ class AssignmentOptions:
                     sys.exit(1)
             if assignment:
                 kwargs["assignment"] = assignment
+                if self.should_prefetch_accepted(assignment, settings, kwargs):
+                    prefetch_accepted_assignments(assignment)
                 try:
                     if settings and self.store:
                         with settings:
@@ -0,0 +1,44 @@
+import click
+import functools
+
+from au.classroom import CacheMode, set_cache_mode, set_offline
+
+
+class CacheOptions:
+    """
+    Adds --no-cache / --refresh / --offline to a command. Must be applied above
+    (i.e., outside of) AssignmentOptions so it takes effect before the
+    assignment is retrieved.
+    """
+
+    def options(self, func):
+        @click.option(
+            "--no-cache",
+            is_flag=True,
+            help="set to bypass the local GitHub API response cache entirely",
+        )
+        @click.option(
+            "--refresh",
+            is_flag=True,
+            help="set to revalidate all cached GitHub API responses",
+        )
+        @click.option(
+            "--offline",
+            is_flag=True,
+            help="set to answer from the local classroom index (`au classroom "
+            "sync`) without contacting GitHub",
+        )
+        @functools.wraps(func)
+        def command_wrapper(*args, **kwargs):
+            no_cache = kwargs.pop("no_cache", False)
+            refresh = kwargs.pop("refresh", False)
+            set_offline(kwargs.pop("offline", False))
+            if no_cache:
+                set_cache_mode(CacheMode.DISABLED)
+            elif refresh:
+                set_cache_mode(CacheMode.REFRESH)
+            else:
+                set_cache_mode(CacheMode.DEFAULT)
+            return func(*args, **kwargs)
+
+        return command_wrapper
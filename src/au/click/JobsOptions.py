@@ -0,0 +1,29 @@
+import click
+import functools
+
+from au.common.parallel import default_job_count
+
+
+class JobsOptions:
+    """
+    Adds -j/--jobs to a command. The wrapped function always receives an
+    integer `jobs` (the CPU-based default if the option was not given).
+    """
+
+    def __init__(self, default: int | None = None):
+        self.default = default
+
+    def options(self, func):
+        @click.option(
+            "-j",
+            "--jobs",
+            type=click.IntRange(min=1),
+            help="the number of repositories to process concurrently "
+            f"(default: {self.default or 'based on the number of CPUs'})",
+        )
+        @functools.wraps(func)
+        def command_wrapper(*args, **kwargs):
+            kwargs["jobs"] = kwargs.get("jobs") or self.default or default_job_count()
+            return func(*args, **kwargs)
+
+        return command_wrapper
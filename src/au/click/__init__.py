@@ -3,5 +3,7 @@ from .SubdirGroup import SubdirGroup
 from .AssignmentOptions import AssignmentOptions
 from .RosterOptions import RosterOptions
 from .DebugOptions import DebugOptions
+from .CacheOptions import CacheOptions
+from .JobsOptions import JobsOptions
 from .BasePathType import BasePathType as BasePath
 
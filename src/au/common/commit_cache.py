@@ -0,0 +1,139 @@
+from dataclasses import asdict
+from datetime import datetime
+from pathlib import Path
+from typing import Callable
+import logging
+
+from .git_tools import MAX_LOG_COMMITS, LogCommit, get_commits_until, iter_commits
+from .state import get_state_dir, load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+
+CACHE_DIR = "commit_history"
+
+
+def read_head_sha(repo_path: Path) -> str | None:
+    """
+    The SHA HEAD resolves to, read straight from the files in .git (no git
+    process). None if it can't be determined that way.
+    """
+    git_dir = Path(repo_path) / ".git"
+    try:
+        if git_dir.is_file():
+            # A worktree: .git names the real git dir, which may share its refs
+            # with the main repository's git dir ("commondir")
+            git_dir = Path(repo_path) / git_dir.read_text().split(":", 1)[1].strip()
+        head = (git_dir / "HEAD").read_text().strip()
+        if not head.startswith("ref:"):
+            return head or None
+        ref = head[4:].strip()
+        common_dir = git_dir
+        if (git_dir / "commondir").is_file():
+            common_dir = git_dir / (git_dir / "commondir").read_text().strip()
+        for refs_dir in dict.fromkeys([git_dir, common_dir]):
+            ref_file = refs_dir / ref
+            if ref_file.is_file():
+                return ref_file.read_text().strip() or None
+        packed_refs = common_dir / "packed-refs"
+        if packed_refs.is_file():
+            for line in packed_refs.read_text().splitlines():
+                sha, _, name = line.partition(" ")
+                if name == ref:
+                    return sha
+    except (OSError, IndexError):
+        logger.debug(f"Unable to read HEAD in {repo_path}", exc_info=True)
+    return None
+
+
+def _entry_name(dir_name: str) -> str:
+    return f"{CACHE_DIR}/{dir_name}.json"
+
+
+def _to_json(commit: LogCommit) -> dict:
+    return asdict(commit) | {"date": commit.date.isoformat()}
+
+
+def _from_json(data: dict) -> LogCommit:
+    return LogCommit(**(data | {"date": datetime.fromisoformat(data["date"])}))
+
+
+def _is_truncated(commits: list[LogCommit], max_count: int | None) -> bool:
+    """Whether a walk limited to max_count may have stopped short of the boundary."""
+    return bool(max_count) and len(commits) >= max_count
+
+
+def _extend_cached(
+    repo_path: Path,
+    cached_head: str,
+    cached_commits: list[LogCommit],
+    is_boundary: Callable[[LogCommit], bool],
+    max_count: int,
+) -> list[LogCommit] | None:
+    """
+    Walk back from HEAD only as far as the cached HEAD and put the new commits
+    in front of the cached ones. None if the cached HEAD is no longer part of
+    the history (e.g., after a force push), so a full walk is needed.
+    """
+    commits: list[LogCommit] = []
+    for commit in iter_commits(repo_path, max_count=max_count):
+        if commit.sha == cached_head:
+            return (commits + cached_commits)[: max_count or None]
+        commits.append(commit)
+        if is_boundary(commit):
+            return commits
+    return commits if _is_truncated(commits, max_count) else None
+
+
+def get_cached_commits_until(
+    root_dir: Path,
+    dir_name: str,
+    cache_key: str,
+    is_boundary: Callable[[LogCommit], bool],
+    max_count: int = MAX_LOG_COMMITS,
+) -> list[LogCommit]:
+    """
+    get_commits_until for ROOT_DIR/dir_name, cached in ROOT_DIR/.au by HEAD
+    SHA. If HEAD hasn't moved, no git process is run at all. If it has, only
+    the commits made since the cached HEAD are read. cache_key identifies
+    is_boundary, so that callers with different boundaries don't share
+    results. Commits cut off by a smaller max_count than this call's are read
+    again.
+    """
+    repo_path = Path(root_dir) / dir_name
+    head = read_head_sha(repo_path)
+    cache = load_state(root_dir, _entry_name(dir_name), {}) if head else {}
+    entry = cache.get(cache_key)
+
+    commits = None
+    if entry:
+        try:
+            cached_commits = [_from_json(c) for c in entry["commits"]]
+            cached_max_count = entry["max_count"]
+            if _is_truncated(cached_commits, cached_max_count) and (
+                not max_count or max_count > cached_max_count
+            ):
+                # The cached walk stopped at its limit; this one may go further
+                logger.debug(
+                    f"Cached commits for {dir_name} stop at {cached_max_count}"
+                )
+            elif entry["head"] == head:
+                return cached_commits[: max_count or None]
+            else:
+                commits = _extend_cached(
+                    repo_path, entry["head"], cached_commits, is_boundary, max_count
+                )
+        except (KeyError, TypeError, ValueError):
+            logger.debug(f"Ignoring invalid commit cache for {dir_name}")
+    if commits is None:
+        commits = get_commits_until(repo_path, is_boundary, max_count)
+
+    if head:
+        cache[cache_key] = {
+            "head": head,
+            "max_count": max_count,
+            "commits": [_to_json(c) for c in commits],
+        }
+        get_state_dir(root_dir, create=True).joinpath(CACHE_DIR).mkdir(exist_ok=True)
+        save_state(root_dir, _entry_name(dir_name), cache)
+    return commits
@@ -0,0 +1,355 @@
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+import hashlib
+import logging
+import re
+import subprocess
+import tempfile
+
+from git_wrap import GitRepo
+from git_wrap.git_repo import GitCommandError
+
+logger = logging.getLogger(__name__)
+
+
+_github_remote_pattern = re.compile(
+    r"github\.com[:/](?P<full_name>[^/]+/[^/]+?)(?:\.git)?/?$"
+)
+
+# The most commits a log walk will read before giving up on finding its boundary
+MAX_LOG_COMMITS = 500
+
+# The branch clone-all --at-deadline checks out (at the deadline commit) in
+# place of the default branch. Nothing is ever committed or pushed on it.
+DEADLINE_BRANCH = "au-deadline"
+
+# Fields of the `git log` format used by iter_commits, separated by 0x1f (unit
+# separator). Commits are separated by NUL (-z).
+_LOG_FORMAT = "%x1f".join(["%H", "%an", "%ae", "%cn", "%ce", "%aI", "%B"])
+_LOG_READ_SIZE = 64 * 1024
+
+# Named sparse-checkout profiles (gitignore-style, non-cone patterns)
+SPARSE_PROFILES: dict[str, list[str]] = {
+    "python": [
+        "*.py",
+        "tests/",
+        "requirements*.txt",
+        "pyproject.toml",
+        "pytest.ini",
+        "*.md",
+    ],
+    "sql": ["*.sql", "tests/", "*.md"],
+}
+
+
+def get_sparse_patterns(profile: str) -> list[str]:
+    """
+    Patterns for a named profile in SPARSE_PROFILES, or else the profile
+    treated as a comma separated list of patterns (e.g. "*.py,tests/").
+    """
+    if profile in SPARSE_PROFILES:
+        return list(SPARSE_PROFILES[profile])
+    return [p.strip() for p in profile.split(",") if p.strip()]
+
+
+def clone(
+    url: str,
+    repo_path: Path,
+    filter: str | None = None,
+    depth: int | None = None,
+    sparse_patterns: Iterable[str] | None = None,
+    reference: Path | None = None,
+) -> None:
+    """
+    Clone url into repo_path, optionally as a partial (`--filter`), shallow
+    (`--depth`) and/or sparse clone, borrowing objects from a `reference`
+    repository where possible. Without any of these it is identical to
+    GitRepo.clone.
+    """
+    sparse_patterns = list(sparse_patterns or [])
+    if not (filter or depth or sparse_patterns or reference):
+        GitRepo.clone(url, repo_path)
+        return
+    repo_path = Path(repo_path)
+    args = ["clone", "--quiet"]
+    if filter:
+        args.append(f"--filter={filter}")
+    if depth:
+        args += ["--depth", str(depth)]
+    if sparse_patterns:
+        args.append("--no-checkout")
+    if reference:
+        args += ["--reference-if-able", str(reference)]
+    GitRepo.git(*args, url, str(repo_path), path=repo_path.parent)
+    if sparse_patterns:
+        GitRepo.git(
+            "sparse-checkout", "set", "--no-cone", *sparse_patterns, path=repo_path
+        )
+        GitRepo.git("checkout", "--quiet", path=repo_path)
+
+
+def update_mirror(url: str, mirror_path: Path) -> Path:
+    """
+    Create or refresh a bare mirror of url at mirror_path. Clones that use it
+    as a reference depend on its objects, so refs are never pruned (pruning
+    would allow gc to delete objects those clones still need).
+    """
+    mirror_path = Path(mirror_path)
+    if mirror_path.exists():
+        GitRepo.git("fetch", "--quiet", path=mirror_path)
+    else:
+        mirror_path.parent.mkdir(parents=True, exist_ok=True)
+        GitRepo.git(
+            "clone",
+            "--quiet",
+            "--mirror",
+            url,
+            str(mirror_path),
+            path=mirror_path.parent,
+        )
+    return mirror_path
+
+
+def get_head_sha(repo_path: Path) -> str | None:
+    result = GitRepo.git("rev-parse", "HEAD", path=repo_path)
+    return result.stdout.strip() if result else None
+
+
+def pull_rebase(repo_path: Path) -> None:
+    """
+    Pull, rebasing any local commits onto the remote's. If that fails (e.g.,
+    on a conflict), the rebase is aborted so the repo is left as it was.
+    """
+    try:
+        GitRepo.git("pull", "--quiet", "--rebase", path=repo_path)
+    except Exception:
+        subprocess.run(["git", "rebase", "--abort"], cwd=repo_path, capture_output=True)
+        raise
+
+
+def get_remote_head_sha(repo_path: Path, remote: str = "origin") -> str | None:
+    """The SHA the remote's HEAD points to, via `git ls-remote` (no fetch)."""
+    result = GitRepo.git("ls-remote", remote, "HEAD", path=repo_path)
+    if not result or not result.stdout.strip():
+        return None
+    return result.stdout.split()[0]
+
+
+def contains_commit(repo_path: Path, sha: str) -> bool:
+    """
+    Whether sha is HEAD or one of its ancestors, i.e., pulling it would change
+    nothing. False if the commit isn't present locally at all.
+    """
+    # Run git directly: a non-zero exit is an expected answer here, not an error
+    result = subprocess.run(
+        ["git", "merge-base", "--is-ancestor", sha, "HEAD"],
+        cwd=repo_path,
+        capture_output=True,
+    )
+    return result.returncode == 0
+
+
+def get_upstream_sha(repo_path: Path) -> str | None:
+    """
+    The tip of the remote default branch (origin/HEAD), falling back to HEAD.
+    Unlike HEAD, this doesn't change when an older commit is checked out.
+    """
+    for rev in ("refs/remotes/origin/HEAD", "HEAD"):
+        result = subprocess.run(
+            ["git", "rev-parse", "--verify", "--quiet", rev],
+            cwd=repo_path,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode == 0:
+            return result.stdout.strip()
+    return None
+
+
+def get_commit_at(repo_path: Path, when: datetime, rev: str = "HEAD") -> str | None:
+    """
+    The last commit on rev's first-parent history authored at or before
+    when, deepening a shallow clone if the answer lies beyond its history.
+
+    Author dates are compared, not committer dates (which `git rev-list
+    --before` would use), so that this agrees with the dates time-details
+    reports (LogCommit.date) about which commits were made by the deadline.
+    """
+    while True:
+        for commit in iter_commits(repo_path, rev, first_parent=True):
+            if commit.date <= when:
+                return commit.sha
+        if not is_shallow(repo_path):
+            return None
+        unshallow(repo_path)
+
+
+def get_current_branch(repo_path: Path) -> str | None:
+    """The name of the branch checked out in repo_path; None if HEAD is detached."""
+    result = subprocess.run(
+        ["git", "symbolic-ref", "--quiet", "--short", "HEAD"],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() if result.returncode == 0 else None
+
+
+def checkout_detached(repo_path: Path, sha: str) -> None:
+    GitRepo.git("checkout", "--quiet", "--detach", sha, path=repo_path)
+
+
+def checkout_branch_at(repo_path: Path, branch: str, sha: str) -> None:
+    """Check out branch, creating it or moving it to sha."""
+    GitRepo.git("checkout", "--quiet", "-B", branch, sha, path=repo_path)
+
+
+def add_worktree(repo_path: Path, worktree_path: Path, sha: str) -> None:
+    """Create (or move) a detached worktree of repo_path at sha."""
+    worktree_path = Path(worktree_path).resolve()
+    if worktree_path.exists():
+        checkout_detached(worktree_path, sha)
+        return
+    worktree_path.parent.mkdir(parents=True, exist_ok=True)
+    GitRepo.git(
+        "worktree",
+        "add",
+        "--quiet",
+        "--detach",
+        str(worktree_path),
+        sha,
+        path=repo_path,
+    )
+
+
+def get_blob_sha(data: bytes) -> str:
+    """The SHA git (and GitHub) assign to a blob with this content."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+def get_github_repo_name(repo_path: Path, remote: str = "origin") -> str | None:
+    """owner/name of the GitHub repository the remote points to."""
+    result = GitRepo.git("remote", "get-url", remote, path=repo_path)
+    match = _github_remote_pattern.search(result.stdout.strip()) if result else None
+    return match.group("full_name") if match else None
+
+
+def is_shallow(repo_path: Path) -> bool:
+    result = GitRepo.git("rev-parse", "--is-shallow-repository", path=repo_path)
+    return bool(result) and result.stdout.strip() == "true"
+
+
+def unshallow(repo_path: Path) -> None:
+    """Fetch the rest of the history of a shallow clone."""
+    GitRepo.git("fetch", "--quiet", "--unshallow", path=repo_path)
+
+
+@dataclass
+class LogCommit:
+    """
+    A commit read by iter_commits. It has the same attributes as
+    git_wrap.Commit that the commands use, so either can be passed around.
+    """
+
+    sha: str
+    author_name: str
+    author_email: str
+    committer_name: str
+    committer_email: str
+    date: datetime
+    message: str
+
+
+def _parse_log_record(record: str) -> LogCommit:
+    sha, author_name, author_email, committer_name, committer_email, date, message = (
+        record.split("\x1f", 6)
+    )
+    return LogCommit(
+        sha.strip(),
+        author_name,
+        author_email,
+        committer_name,
+        committer_email,
+        datetime.fromisoformat(date),
+        message,
+    )
+
+
+def iter_commits(
+    repo_path: Path,
+    rev: str = "HEAD",
+    max_count: int | None = None,
+    first_parent: bool = False,
+) -> Iterator[LogCommit]:
+    """
+    Stream the commits reachable from rev (newest first) out of `git log` as
+    they are parsed, instead of reading the whole log up front. Stopping the
+    iteration early stops git. Yields nothing for a repo without commits.
+    """
+    args = ["git", "log", "-z", f"--format={_LOG_FORMAT}"]
+    if max_count:
+        args.append(f"--max-count={max_count}")
+    if first_parent:
+        args.append("--first-parent")
+    # stderr goes to a file: a pipe nobody reads until stdout ends could fill
+    # up and leave git blocked on it
+    errors = tempfile.TemporaryFile("w+", encoding="utf-8", errors="replace")
+    process = subprocess.Popen(
+        [*args, rev, "--"],
+        cwd=repo_path,
+        stdout=subprocess.PIPE,
+        stderr=errors,
+        text=True,
+        encoding="utf-8",
+        errors="replace",
+    )
+    finished = False
+    try:
+        pending = ""
+        while chunk := process.stdout.read(_LOG_READ_SIZE):
+            *records, pending = (pending + chunk).split("\0")
+            for record in records:
+                yield _parse_log_record(record)
+        if pending.strip():
+            yield _parse_log_record(pending)
+        finished = True
+    finally:
+        if not finished:
+            process.kill()
+        process.stdout.close()
+        with errors:
+            if process.wait() != 0 and finished:
+                errors.seek(0)
+                logger.debug(f"git log failed in {repo_path}: {errors.read().strip()}")
+
+
+def get_commits_until(
+    repo_path: Path,
+    is_boundary: Callable[[LogCommit], bool],
+    max_count: int = MAX_LOG_COMMITS,
+) -> list[LogCommit]:
+    """
+    Commits from HEAD backwards, up to and including the first one for which
+    is_boundary returns True, reading at most max_count commits. A shallow
+    clone whose history ends before such a commit is found is deepened (once)
+    and walked again, so history is only fetched when it is actually needed.
+    """
+    while True:
+        commits: list[LogCommit] = []
+        for commit in iter_commits(repo_path, max_count=max_count):
+            commits.append(commit)
+            if is_boundary(commit):
+                return commits
+        if max_count and len(commits) >= max_count:
+            logger.debug(f"No boundary in the last {max_count} commits of {repo_path}")
+            return commits
+        try:
+            if not is_shallow(repo_path):
+                return commits
+            logger.info(f"Fetching full history for {Path(repo_path).resolve().name}")
+            unshallow(repo_path)
+        except GitCommandError:
+            logger.warning(f"Unable to fetch full history for {repo_path}")
+            return commits
@@ -0,0 +1,123 @@
+from pathlib import Path
+from typing import Any, Callable
+import logging
+import threading
+import uuid
+
+from .state import get_state_dir, load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+
+PLANNED = "planned"
+DONE = "done"
+FAILED = "failed"
+
+
+class Journal:
+    """
+    An on-disk record (in ROOT_DIR/.au) of the operations a bulk command has
+    planned and which of them completed, written after every operation so an
+    interrupted run can be resumed.
+
+    The file only outlives a run that was interrupted: close() removes it
+    whether or not every operation succeeded. A later run resumes it only if
+    `context` (e.g., the assignment id) matches; otherwise it is discarded.
+    """
+
+    def __init__(self, root_dir: Path, name: str, context: dict[str, Any]):
+        self.root_dir = Path(root_dir)
+        self.name = name
+        self.context = context
+        self.run_id = uuid.uuid4().hex
+        self._lock = threading.Lock()
+        data = load_state(self.root_dir, name, None) or {}
+        self.resumed = bool(data.get("entries")) and data.get("context") == context
+        # Entries of the interrupted run being resumed (none for another context)
+        self.previous_entries: dict[str, dict] = (
+            data.get("entries", {}) if self.resumed else {}
+        )
+        # Only completed work carries over; anything else is planned again
+        self.entries: dict[str, dict] = {
+            key: entry
+            for key, entry in self.previous_entries.items()
+            if entry.get("state") == DONE
+        }
+        if data and not self.resumed:
+            logger.debug(f"Discarding journal {name} from another run")
+
+    def interrupted(self, op: str) -> list[str]:
+        """Keys of `op` operations the interrupted run started but never completed."""
+        return [
+            key
+            for key, entry in self.previous_entries.items()
+            if entry.get("op") == op and entry.get("state") != DONE
+        ]
+
+    def failed(self, op: str) -> list[str]:
+        """Keys of `op` operations that failed in this run."""
+        return [
+            key
+            for key, entry in self.entries.items()
+            if entry.get("op") == op
+            and entry.get("run_id") == self.run_id
+            and entry.get("state") == FAILED
+        ]
+
+    def is_done(self, key: str, op: str) -> bool:
+        """Whether the interrupted run (or this one) completed this operation."""
+        entry = self.entries.get(key)
+        return bool(entry) and entry.get("op") == op and entry.get("state") == DONE
+
+    def plan(self, ops: dict[str, str]) -> None:
+        """Record {key: op} as planned (keeping anything already done)."""
+        with self._lock:
+            for key, op in ops.items():
+                if not self.is_done(key, op):
+                    self.entries[key] = {
+                        "op": op,
+                        "state": PLANNED,
+                        "run_id": self.run_id,
+                    }
+            self._save()
+
+    def finish(self, key: str, result: Any = None) -> None:
+        with self._lock:
+            self.entries[key].update(state=DONE, result=result)
+            self._save()
+
+    def fail(self, key: str) -> None:
+        with self._lock:
+            self.entries[key]["state"] = FAILED
+            self._save()
+
+    def track(self, key: str, func: Callable[[], Any]) -> Callable[[], Any]:
+        """Wrap func so its completion (or failure) is journaled."""
+
+        def tracked():
+            try:
+                result = func()
+            except Exception:
+                self.fail(key)
+                raise
+            self.finish(key, result)
+            return result
+
+        return tracked
+
+    def close(self) -> None:
+        """
+        Remove the journal now that the run has finished. Failed operations are
+        reported by the command and simply retried by the next run, so nothing
+        is kept for them.
+        """
+        with self._lock:
+            file = get_state_dir(self.root_dir) / self.name
+            file.unlink(missing_ok=True)
+
+    def _save(self) -> None:
+        save_state(
+            self.root_dir,
+            self.name,
+            {"context": self.context, "run_id": self.run_id, "entries": self.entries},
+        )
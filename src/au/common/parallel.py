@@ -0,0 +1,242 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from typing import Any, Callable, Generator
+import logging
+import os
+import random
+import threading
+import time
+
+from rich.console import Console, Group
+from rich.live import Live
+from rich.table import Table
+from rich.text import Text
+
+logger = logging.getLogger(__name__)
+
+
+MAX_DEFAULT_JOBS = 16
+MAX_DISPLAY_ROWS = 20
+
+
+def default_job_count() -> int:
+    """
+    A default for --jobs. Git operations mostly wait on the network, so allow
+    a couple of jobs per CPU, but stay polite to GitHub.
+    """
+    return max(1, min(MAX_DEFAULT_JOBS, (os.cpu_count() or 1) * 2))
+
+
+def call_with_retries(
+    func: Callable[[], Any],
+    retries: int = 2,
+    base_delay: float = 1.0,
+    description: str = "Operation",
+    retry_if: Callable[[Exception], bool] | None = None,
+) -> Any:
+    """
+    Call func, retrying up to `retries` more times if it raises (and
+    retry_if, if given, returns True for the exception), with full jitter
+    exponential backoff between attempts.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return func()
+        except Exception as ex:
+            if attempt >= retries or (retry_if and not retry_if(ex)):
+                raise
+            delay = random.uniform(0, base_delay * 2**attempt)
+            logger.warning(f"{description} failed ({ex}); retrying in {delay:.1f}s")
+            time.sleep(delay)
+
+
+@dataclass
+class JobResult:
+    key: str
+    value: Any = None
+    error: Exception | None = None
+    elapsed: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class _JobsDisplay:
+    """Renders a live table of running and recently finished jobs."""
+
+    def __init__(self, title: str, keys: list[str]):
+        self.title = title
+        self.total = len(keys)
+        self._lock = threading.Lock()
+        self._started: dict[str, float] = {}
+        self._finished: list[JobResult] = []
+        self._errors = 0
+
+    def start(self, key: str) -> None:
+        with self._lock:
+            self._started[key] = time.monotonic()
+
+    def finish(self, result: JobResult) -> None:
+        with self._lock:
+            self._started.pop(result.key, None)
+            self._finished.append(result)
+            if not result.ok:
+                self._errors += 1
+
+    def __rich__(self):
+        with self._lock:
+            now = time.monotonic()
+            running = sorted(self._started.items(), key=lambda kv: kv[1])
+            recent = self._finished[-max(0, MAX_DISPLAY_ROWS - len(running)) :]
+            done = len(self._finished)
+            errors = self._errors
+
+        table = Table(box=None, show_header=True, header_style="bold")
+        table.add_column("REPOSITORY")
+        table.add_column("STATUS")
+        table.add_column("TIME", justify="right")
+        for result in recent:
+            if result.ok:
+                status = Text("done", style="green")
+            else:
+                status = Text(f"error: {result.error}", style="red")
+            table.add_row(result.key, status, f"{result.elapsed:.1f}s")
+        for key, started in running[:MAX_DISPLAY_ROWS]:
+            table.add_row(key, Text("running", style="yellow"), f"{now - started:.1f}s")
+
+        heading = f"{self.title}: {done}/{self.total} complete"
+        if errors:
+            heading += f", {errors} failed"
+        return Group(Text(heading, style="bold"), table)
+
+
+def run_jobs(
+    jobs: dict[str, Callable[[], Any]],
+    max_workers: int,
+    title: str = "Working",
+    console: Console | None = None,
+) -> dict[str, JobResult]:
+    """
+    Run each callable in `jobs` on a pool of at most `max_workers` threads
+    while showing a live per-job progress table. Exceptions are captured in
+    the returned JobResult rather than raised. Results are returned in the
+    same order as `jobs`. On Ctrl-C, jobs that haven't started yet are
+    cancelled rather than run before KeyboardInterrupt is re-raised.
+    """
+    if not jobs:
+        return {}
+
+    display = _JobsDisplay(title, list(jobs))
+
+    def run(key: str, func: Callable[[], Any]) -> JobResult:
+        display.start(key)
+        start = time.monotonic()
+        result = JobResult(key)
+        try:
+            result.value = func()
+        except Exception as ex:
+            logger.debug(f"{key} failed", exc_info=True)
+            result.error = ex
+        result.elapsed = time.monotonic() - start
+        display.finish(result)
+        return result
+
+    results: dict[str, JobResult] = {}
+    workers = max(1, min(max_workers, len(jobs)))
+    with Live(display, console=console, refresh_per_second=8, transient=True):
+        executor = ThreadPoolExecutor(max_workers=workers)
+        futures = []
+        try:
+            for key, func in jobs.items():
+                futures.append(executor.submit(run, key, func))
+            for future in as_completed(futures):
+                result = future.result()
+                results[result.key] = result
+        except KeyboardInterrupt:
+            # Don't wait for the queued jobs: only those already running finish
+            executor.shutdown(wait=False, cancel_futures=True)
+            for future in futures:
+                future.cancel()
+            raise
+        executor.shutdown()
+    return {key: results[key] for key in jobs}
+
+
+StagedJob = Callable[[], Generator[str, None, Any]]
+
+
+def run_staged_jobs(
+    jobs: dict[str, StagedJob],
+    pool_sizes: dict[str, int],
+    title: str = "Working",
+    console: Console | None = None,
+) -> dict[str, JobResult]:
+    """
+    Like run_jobs, but for jobs whose steps are limited separately (e.g.,
+    network steps by --jobs and local ones by the CPU count). Each job is a
+    generator function that yields the name of the pool (a key of pool_sizes)
+    to run its next step on, and returns its value. Every pool has threads of
+    its own, so a job waiting for one kind of step never holds a thread that
+    another job could use for a different kind.
+    """
+    if not jobs:
+        return {}
+
+    display = _JobsDisplay(title, list(jobs))
+    results: dict[str, JobResult] = {}
+    started: dict[str, float] = {}
+    all_done = threading.Event()
+    lock = threading.Lock()
+    executors = {
+        name: ThreadPoolExecutor(max_workers=max(1, size))
+        for name, size in pool_sizes.items()
+    }
+
+    def finish(result: JobResult) -> None:
+        result.elapsed = time.monotonic() - started.get(result.key, time.monotonic())
+        display.finish(result)
+        with lock:
+            results[result.key] = result
+            if len(results) == len(jobs):
+                all_done.set()
+
+    def queue_next(key: str, steps: Generator[str, None, Any]) -> None:
+        """Queue the job's next step on the pool it yields, unless it's done."""
+        try:
+            pool = next(steps)
+            executor = executors[pool]
+        except StopIteration as stop:
+            finish(JobResult(key, stop.value))
+            return
+        except Exception as ex:
+            logger.debug(f"{key} failed", exc_info=True)
+            finish(JobResult(key, error=ex))
+            return
+        try:
+            executor.submit(run_step, key, steps)
+        except RuntimeError:
+            # Shut down after Ctrl-C
+            steps.close()
+
+    def run_step(key: str, steps: Generator[str, None, Any]) -> None:
+        if key not in started:
+            started[key] = time.monotonic()
+            display.start(key)
+        queue_next(key, steps)
+
+    with Live(display, console=console, refresh_per_second=8, transient=True):
+        try:
+            for key, func in jobs.items():
+                # Up to its first yield, a job only picks the pool to start on
+                queue_next(key, func())
+            while not all_done.wait(0.1):
+                pass
+        except KeyboardInterrupt:
+            # Don't wait for queued steps: only those already running finish
+            for executor in executors.values():
+                executor.shutdown(wait=False, cancel_futures=True)
+            raise
+        for executor in executors.values():
+            executor.shutdown()
+    return {key: results[key] for key in jobs}
@@ -0,0 +1,46 @@
+from pathlib import Path
+from typing import Any
+import json
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+
+STATE_DIR_NAME = ".au"
+
+
+def get_state_dir(root_dir: Path, create: bool = False) -> Path:
+    """
+    The hidden directory in an assignment's ROOT_DIR where au keeps
+    bookkeeping between runs (it is ignored when scanning for student repos).
+    """
+    state_dir = Path(root_dir) / STATE_DIR_NAME
+    if create:
+        state_dir.mkdir(parents=True, exist_ok=True)
+    return state_dir
+
+
+def load_state(root_dir: Path, name: str, default: Any = None) -> Any:
+    """
+    Load the JSON state document `name` from ROOT_DIR/.au. Returns `default`
+    if it doesn't exist or can't be read.
+    """
+    file = get_state_dir(root_dir) / name
+    try:
+        with open(file, "r") as fi:
+            return json.load(fi)
+    except FileNotFoundError:
+        return default
+    except (OSError, ValueError):
+        logger.warning(f"Ignoring unreadable state file {file}")
+        return default
+
+
+def save_state(root_dir: Path, name: str, data: Any) -> None:
+    """Atomically write the JSON state document `name` to ROOT_DIR/.au."""
+    file = get_state_dir(root_dir, create=True) / name
+    tmp_file = file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w") as fo:
+        json.dump(data, fo, indent=2)
+    os.replace(tmp_file, file)
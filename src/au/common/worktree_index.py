@@ -0,0 +1,250 @@
+from pathlib import Path
+import logging
+import os
+import subprocess
+import time
+
+from .git_tools import get_blob_sha
+from .state import get_state_dir, load_state, save_state
+
+logger = logging.getLogger(__name__)
+
+
+INDEX_DIR = "worktree_index"
+
+# A file modified this close to a snapshot might change again within the same
+# mtime tick without its size changing (git calls this "racily clean"), so its
+# stats can't prove anything and its content is compared instead.
+RACY_NS = 100_000_000
+
+# {"files": {path: [mtime_ns, size, staged_sha, content_sha]},
+#  "dirs": {path: mtime_ns or [entry names]}}
+# mtime_ns and size are None for a tracked file missing from the worktree.
+# staged_sha is the blob git has staged for the file (None if untracked).
+# content_sha is the blob SHA of the file's content when its stats alone
+# can't vouch for it; otherwise the file matched staged_sha when recorded.
+# Likewise, a racily clean directory's entries are recorded, not its mtime.
+Snapshot = dict[str, dict]
+
+
+def _list_files(repo_path: Path) -> dict[str, str | None] | None:
+    """
+    {path: staged blob SHA (None if untracked)} for every file in the worktree
+    git doesn't ignore (the same files get_eval_key hashes, so .git, .venv,
+    __pycache__ and the like are left out). None if git can't list them.
+    """
+    result = subprocess.run(
+        [
+            "git",
+            "ls-files",
+            "-z",
+            "--stage",
+            "--cached",
+            "--others",
+            "--exclude-standard",
+        ],
+        cwd=repo_path,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        return None
+    files: dict[str, str | None] = {}
+    for line in result.stdout.split("\0"):
+        if not line:
+            continue
+        info, tab, name = line.partition("\t")
+        if tab:
+            files[name] = info.split()[1]
+        else:
+            files[line] = None
+    return files
+
+
+def _content_sha(path: Path) -> str | None:
+    try:
+        return get_blob_sha(path.read_bytes())
+    except OSError:
+        return None
+
+
+def take_snapshot(repo_path: Path, previous: Snapshot | None = None) -> Snapshot | None:
+    """
+    The stats of every file git lists in the worktree, plus the mtime of each
+    directory holding one (creating or deleting a file in it changes that),
+    .git/index and .git/HEAD. None if git can't list the files.
+
+    Racily clean files, and any file whose stats differ from `previous` (the
+    snapshot recorded before the caller wrote to the repo), get their content
+    SHA recorded, so whether they match what git has staged is known.
+    """
+    repo_path = Path(repo_path)
+    files = _list_files(repo_path)
+    if files is None:
+        return None
+    taken_at = time.time_ns()
+    previous_files = previous["files"] if previous else {}
+    snapshot: Snapshot = {"files": {}, "dirs": {}}
+
+    for name, staged_sha in files.items():
+        path = repo_path / name
+        try:
+            st = path.stat(follow_symlinks=False)
+            stats = [st.st_mtime_ns, st.st_size]
+        except OSError:
+            snapshot["files"][name] = [None, None, staged_sha, None]
+            continue
+        content_sha = None
+        old = previous_files.get(name)
+        if old and old[:3] == [*stats, staged_sha]:
+            content_sha = old[3]
+        elif previous is not None or stats[0] >= taken_at - RACY_NS:
+            content_sha = _content_sha(path)
+        snapshot["files"][name] = [*stats, staged_sha, content_sha]
+        for parent in Path(name).parents:
+            snapshot["dirs"].setdefault(parent.as_posix(), 0)
+
+    try:
+        for name in snapshot["dirs"]:
+            mtime = (repo_path / name).stat().st_mtime_ns
+            if mtime >= taken_at - RACY_NS:
+                snapshot["dirs"][name] = sorted(os.listdir(repo_path / name))
+            else:
+                snapshot["dirs"][name] = mtime
+    except OSError:
+        # Removed while the snapshot was being taken
+        return None
+    for name in ("index", "HEAD"):
+        try:
+            st = (repo_path / ".git" / name).stat()
+            snapshot["files"][f".git/{name}"] = [st.st_mtime_ns, st.st_size, None, None]
+        except OSError:
+            pass
+    return snapshot
+
+
+def _is_dirty(snapshot: Snapshot) -> bool:
+    for name, (mtime, _, staged_sha, content_sha) in snapshot["files"].items():
+        if name.startswith(".git/"):
+            continue
+        if mtime is None or staged_sha is None:
+            # Deleted, or untracked (and not ignored)
+            return True
+        if content_sha is not None and content_sha != staged_sha:
+            return True
+    return False
+
+
+def _is_current(repo_path: Path, snapshot: Snapshot) -> bool:
+    """
+    Whether the worktree is still as recorded in snapshot. Git is only run if
+    a directory has gained or lost entries, to check whether they are all
+    ignored ones (e.g., __pycache__).
+    """
+    dirs_changed = False
+    for name, recorded in snapshot["dirs"].items():
+        try:
+            if isinstance(recorded, list):
+                dirs_changed = sorted(os.listdir(repo_path / name)) != recorded
+            else:
+                dirs_changed = (repo_path / name).stat().st_mtime_ns != recorded
+        except OSError:
+            return False
+        if dirs_changed:
+            break
+    for name, (mtime, size, _, content_sha) in snapshot["files"].items():
+        path = repo_path / name
+        try:
+            st = path.stat(follow_symlinks=False)
+        except OSError:
+            if mtime is None:
+                continue
+            return False
+        if [st.st_mtime_ns, st.st_size] != [mtime, size]:
+            return False
+        if content_sha is not None and _content_sha(path) != content_sha:
+            return False
+    if dirs_changed:
+        recorded_files = {
+            name: entry[2]
+            for name, entry in snapshot["files"].items()
+            if not name.startswith(".git/")
+        }
+        return _list_files(repo_path) == recorded_files
+    return True
+
+
+def _entry_name(dir_name: str) -> str:
+    return f"{INDEX_DIR}/{dir_name}.json"
+
+
+def _save(root_dir: Path, dir_name: str, snapshot: Snapshot | None) -> None:
+    if snapshot is None:
+        invalidate(Path(root_dir) / dir_name)
+        return
+    get_state_dir(root_dir, create=True).joinpath(INDEX_DIR).mkdir(exist_ok=True)
+    save_state(root_dir, _entry_name(dir_name), snapshot)
+
+
+def record_clean(
+    root_dir: Path, dir_name: str, snapshot: Snapshot | None = None
+) -> None:
+    """
+    Record that ROOT_DIR/dir_name has no changes to commit. Pass a snapshot
+    taken *before* confirming that (e.g., with git status) so that changes
+    made in the meantime are not missed.
+    """
+    if snapshot is None:
+        snapshot = take_snapshot(Path(root_dir) / dir_name)
+    _save(root_dir, dir_name, snapshot)
+
+
+def get_current_entry(repo_path: Path) -> Snapshot | None:
+    """
+    The recorded snapshot of a repo if its worktree still matches it. Take it
+    before writing to the repo, and pass it to record_writes afterwards.
+    """
+    repo_path = Path(repo_path).resolve()
+    snapshot = load_state(repo_path.parent, _entry_name(repo_path.name))
+    try:
+        if snapshot and _is_current(repo_path, snapshot):
+            return snapshot
+    except (KeyError, TypeError, ValueError):
+        logger.debug(f"Ignoring invalid worktree index for {repo_path.name}")
+    return None
+
+
+def record_writes(repo_path: Path, before: Snapshot | None) -> None:
+    """
+    Keep the recorded snapshot of a repo current after writing files to it
+    (e.g., FEEDBACK.md), so commit-all still knows whether the repo has
+    changes without running git status. `before` is the entry from
+    get_current_entry; if it was None, nothing is recorded.
+    """
+    repo_path = Path(repo_path).resolve()
+    if before is None:
+        invalidate(repo_path)
+        return
+    _save(repo_path.parent, repo_path.name, take_snapshot(repo_path, before))
+
+
+def is_known_clean(root_dir: Path, dir_name: str) -> bool:
+    """
+    Whether ROOT_DIR/dir_name provably has no changes to commit, judging by
+    its recorded snapshot alone (no git process). False means git has to be
+    asked: the worktree may have changed, or may only seem to. Content is
+    compared without git's filters (autocrlf, eol attributes, LFS, ...), so
+    a snapshot can show changes git status wouldn't, but never the reverse.
+    """
+    snapshot = get_current_entry(Path(root_dir) / dir_name)
+    return snapshot is not None and not _is_dirty(snapshot)
+
+
+def invalidate(repo_path: Path) -> None:
+    """Forget the recorded state of a repo (e.g., while writing files to it)."""
+    repo_path = Path(repo_path).resolve()
+    file = get_state_dir(repo_path.parent) / _entry_name(repo_path.name)
+    try:
+        file.unlink(missing_ok=True)
+    except OSError:
+        logger.debug(f"Unable to remove {file}", exc_info=True)
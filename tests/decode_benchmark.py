@@ -0,0 +1,91 @@
+# Micro-benchmark comparing accepted assignment decoding paths:
+#   old: json.loads(object_hook=github_json_deserializer) + dacite.from_dict
+#   new: json.loads + classroom_types.decode
+# Run with: python tests/decode_benchmark.py [NUM_STUDENTS]
+if __name__ == "__main__":
+
+    import json
+    import sys
+    from timeit import repeat
+
+    from dacite import from_dict
+
+    from au.classroom import AcceptedAssignment
+    from au.classroom.classroom_types import decode
+    from au.classroom.gh import github_json_deserializer
+
+    num_students = int(sys.argv[1]) if len(sys.argv) > 1 else 400
+
+    def make_accepted_assignment(num: int) -> dict:
+        login = f"student{num}"
+        return {
+            "id": num,
+            "submitted": True,
+            "passing": num % 3 == 0,
+            "commit_count": num % 7,
+            "grade": None,
+            "students": [
+                {
+                    "id": 1000 + num,
+                    "login": login,
+                    "name": f"Student {num}",
+                    "avatar_url": f"https://avatars.githubusercontent.com/u/{num}",
+                    "html_url": f"https://github.com/{login}",
+                }
+            ],
+            "repository": {
+                "id": 2000 + num,
+                "name": f"hw1-{login}",
+                "full_name": f"org/hw1-{login}",
+                "html_url": f"https://github.com/org/hw1-{login}",
+                "node_id": f"R_kgDO{num:08d}",
+                "private": True,
+                "default_branch": "main",
+            },
+            "assignment": {
+                "id": 1,
+                "title": "Homework 1",
+                "slug": "hw1",
+                "deadline": "2025-01-31T23:59:00Z",
+                "accepted": num_students,
+                "submissions": num_students,
+                "passing": 0,
+                "invite_link": "https://classroom.github.com/a/abc123",
+                "type": "individual",
+                "editor": "codespaces",
+                "public_repo": False,
+                "invitations_enabled": True,
+                "students_are_repo_admins": False,
+                "feedback_pull_requests_enabled": False,
+                "max_teams": None,
+                "max_members": None,
+                "language": "python",
+                "classroom": {
+                    "id": 1,
+                    "name": "Intro to Programming",
+                    "url": "https://classroom.github.com/classrooms/1",
+                    "archived": False,
+                    "organization": None,
+                },
+                "starter_code_repository": None,
+            },
+        }
+
+    payload = json.dumps([make_accepted_assignment(n) for n in range(num_students)])
+
+    def old_path():
+        data = json.loads(payload, object_hook=github_json_deserializer)
+        return [from_dict(AcceptedAssignment, d) for d in data]
+
+    def new_path():
+        return [decode(AcceptedAssignment, d) for d in json.loads(payload)]
+
+    assert old_path() == new_path(), "decoders disagree"
+
+    runs = 20
+    old_best = min(repeat(old_path, number=1, repeat=runs))
+    new_best = min(repeat(new_path, number=1, repeat=runs))
+    print(f"{num_students} accepted assignments, best of {runs} runs")
+    print(f"  hook + dacite: {old_best * 1000:8.2f} ms")
+    print(f"  decode:        {new_best * 1000:8.2f} ms")
+    print(f"  speedup:       {old_best / new_best:8.1f}x")
@@ -0,0 +1,51 @@
+import subprocess
+
+import pytest
+
+from au.common.commit_cache import get_cached_commits_until
+
+
+def commit(repo, message):
+    with open(repo / "log.txt", "a") as fo:
+        fo.write(f"{message}\n")
+    for args in (["add", "."], ["commit", "-qm", message]):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=repo,
+            check=True,
+            capture_output=True,
+        )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "student"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q", "-b", "main"], cwd=repo, check=True)
+    for message in ("boundary", "second", "third", "fourth"):
+        commit(repo, message)
+    return repo
+
+
+def get_commits(repo, max_count):
+    commits = get_cached_commits_until(
+        repo.parent,
+        repo.name,
+        "boundary",
+        lambda c: c.message.strip() == "boundary",
+        max_count,
+    )
+    return [c.message.strip() for c in commits]
+
+
+def test_larger_limit_walks_past_smaller_one(repo):
+    assert get_commits(repo, 2) == ["fourth", "third"]
+    assert get_commits(repo, 10) == ["fourth", "third", "second", "boundary"]
+    # A complete walk serves any limit
+    assert get_commits(repo, 3) == ["fourth", "third", "second"]
+
+
+def test_larger_limit_after_new_commits(repo):
+    assert get_commits(repo, 2) == ["fourth", "third"]
+    commit(repo, "fifth")
+    assert get_commits(repo, 10) == ["fifth", "fourth", "third", "second", "boundary"]
@@ -0,0 +1,135 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import json
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+from au.classroom import gh
+from au.classroom.gh_cache import ResponseCache
+from au.classroom.gh_http import GitHubHttpClient
+
+LAST_PAGE = 4
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """A local stand-in for the GitHub API."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, like GitHub
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.requests.append((self.client_address, self.path))
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+        try:
+            parts = urlsplit(self.path)
+            if parts.path == "/repo":
+                self.get_repo()
+            elif parts.path == "/items":
+                self.get_items(int(parse_qs(parts.query).get("page", ["1"])[0]))
+            else:
+                self.reply(404, {"message": "Not Found"})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def get_repo(self):
+        if self.headers["If-None-Match"] == '"v1"':
+            self.reply(304, None)
+        else:
+            self.reply(200, {"name": "student"}, {"ETag": '"v1"'})
+
+    def get_items(self, page):
+        if page > 1:
+            time.sleep(0.2)  # long enough for the other pages to overlap
+        base = f"http://{self.headers['Host']}/items?per_page=1"
+        links = [f'<{base}&page={LAST_PAGE}>; rel="last"']
+        if page < LAST_PAGE:
+            links.append(f'<{base}&page={page + 1}>; rel="next"')
+        self.reply(200, [page], {"Link": ", ".join(links)})
+
+    def reply(self, status, data, headers=None):
+        body = b"" if data is None else json.dumps(data).encode()
+        with self.server.lock:
+            self.server.statuses.append(status)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StandIn)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.requests = []
+    server.statuses = []
+    server.in_flight = 0
+    server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def client(server):
+    host, port = server.server_address
+    client = GitHubHttpClient("token", base_url=f"http://{host}:{port}")
+    yield client
+    client.close()
+
+
+def test_gets_reuse_pooled_connection(server, client):
+    for _ in range(5):
+        assert client.get("repo").json() == {"name": "student"}
+    assert len(server.requests) == 5
+    assert len({address for address, _ in server.requests}) == 1
+
+
+def test_unchanged_response_is_served_from_cache(server, client, tmp_path):
+    # No TTLs: every GET goes to the server, but only to revalidate
+    client.cache = ResponseCache(tmp_path, ttls=[])
+    first = client.get("repo")
+    second = client.get("repo")
+    assert server.statuses == [200, 304]
+    assert second.status == 200
+    assert second.json() == first.json() == {"name": "student"}
+
+
+def test_pages_are_fetched_concurrently(server, client):
+    responses = client.paginate("items", {"per_page": 1})
+    assert [resp.json() for resp in responses] == [[1], [2], [3], [4]]
+    # Pages 2..last were requested together, from the rel="last" link
+    assert server.max_in_flight > 1
+
+
+def test_falls_back_to_gh_when_unreachable(monkeypatch):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    client = GitHubHttpClient("token", base_url=f"http://127.0.0.1:{port}")
+    monkeypatch.setattr(gh, "_client", client)
+    monkeypatch.setattr(gh, "_client_loaded", True)
+    commands = []
+
+    def run(cmd, **kwargs):
+        commands.append(cmd)
+        return subprocess.CompletedProcess(cmd, 0, stdout='{"name": "student"}')
+
+    monkeypatch.setattr(gh.subprocess, "run", run)
+    assert gh.gh_api_raw("repo") == {"name": "student"}
+    assert commands == [["gh", "api", "repo", "--paginate"]]
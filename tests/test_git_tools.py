@@ -0,0 +1,72 @@
+from datetime import datetime
+import logging
+import os
+import subprocess
+
+import pytest
+
+from au.common.git_tools import (
+    DEADLINE_BRANCH,
+    checkout_branch_at,
+    get_commit_at,
+    get_current_branch,
+    iter_commits,
+)
+
+
+def commit(repo, message, authored, committed):
+    with open(repo / "log.txt", "a") as fo:
+        fo.write(f"{message}\n")
+    env = os.environ | {
+        "GIT_AUTHOR_DATE": authored,
+        "GIT_COMMITTER_DATE": committed,
+    }
+    for args in (["add", "."], ["commit", "-qm", message]):
+        subprocess.run(
+            ["git", "-c", "user.name=t", "-c", "user.email=t@t", *args],
+            cwd=repo,
+            env=env,
+            check=True,
+            capture_output=True,
+        )
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "student"
+    repo.mkdir()
+    subprocess.run(["git", "init", "-q", "-b", "main"], cwd=repo, check=True)
+    commit(repo, "first", "2024-01-01T10:00:00+00:00", "2024-01-01T10:00:00+00:00")
+    # Authored before the deadline, but committed (e.g., rebased) after it
+    commit(repo, "on time", "2024-01-02T10:00:00+00:00", "2024-01-05T10:00:00+00:00")
+    commit(repo, "late", "2024-01-04T10:00:00+00:00", "2024-01-04T10:00:00+00:00")
+    return repo
+
+
+def test_commit_at_uses_author_dates(repo):
+    deadline = datetime.fromisoformat("2024-01-03T00:00:00+00:00")
+    commits = {c.message.strip(): c for c in iter_commits(repo)}
+    sha = get_commit_at(repo, deadline)
+    assert sha == commits["on time"].sha
+    # The same commits time-details counts as on time
+    on_time = [c.sha for c in commits.values() if c.date <= deadline]
+    assert sha == on_time[0]
+
+
+def test_no_commit_before_deadline(repo):
+    deadline = datetime.fromisoformat("2023-12-31T00:00:00+00:00")
+    assert get_commit_at(repo, deadline) is None
+
+
+def test_deadline_checkout_stays_on_a_branch(repo):
+    deadline = datetime.fromisoformat("2024-01-03T00:00:00+00:00")
+    checkout_branch_at(repo, DEADLINE_BRANCH, get_commit_at(repo, deadline))
+    assert get_current_branch(repo) == DEADLINE_BRANCH
+    subprocess.run(["git", "checkout", "-q", "--detach"], cwd=repo, check=True)
+    assert get_current_branch(repo) is None
+
+
+def test_failed_log_is_reported(repo, caplog):
+    with caplog.at_level(logging.DEBUG, logger="au.common.git_tools"):
+        assert list(iter_commits(repo, "no-such-branch")) == []
+    assert "no-such-branch" in caplog.text
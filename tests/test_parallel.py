@@ -0,0 +1,97 @@
+import io
+import os
+import signal
+import threading
+import time
+
+import pytest
+from rich.console import Console
+
+from au.common.parallel import run_jobs, run_staged_jobs
+
+
+def test_run_jobs_returns_results_in_order():
+    jobs = {f"job{num}": (lambda num=num: num * 2) for num in range(5)}
+    results = run_jobs(jobs, 3, console=Console(file=io.StringIO()))
+    assert list(results) == list(jobs)
+    assert [r.value for r in results.values()] == [0, 2, 4, 6, 8]
+
+
+def test_run_jobs_captures_errors():
+    def fail():
+        raise ValueError("broken")
+
+    results = run_jobs({"bad": fail}, 1, console=Console(file=io.StringIO()))
+    assert not results["bad"].ok
+    assert isinstance(results["bad"].error, ValueError)
+
+
+def test_queued_jobs_do_not_start_after_interrupt():
+    release = threading.Event()
+    started = []
+
+    def interrupt():
+        started.append("first")
+        # Let run_jobs submit everything and start waiting, as on a real Ctrl-C
+        time.sleep(0.2)
+        os.kill(os.getpid(), signal.SIGINT)
+        release.wait(2)
+
+    jobs = {"first": interrupt}
+    for num in range(5):
+        jobs[f"queued{num}"] = lambda num=num: started.append(f"queued{num}")
+
+    try:
+        with pytest.raises(KeyboardInterrupt):
+            run_jobs(jobs, 1, console=Console(file=io.StringIO()))
+    finally:
+        release.set()
+
+    # Give the worker thread a chance to (wrongly) pick up a queued job
+    time.sleep(0.2)
+    assert started == ["first"]
+
+
+def test_staged_jobs_use_each_pool_up_to_its_size():
+    lock = threading.Lock()
+    running = {"local": 0, "network": 0}
+    most = {"local": 0, "network": 0}
+
+    def step(pool):
+        with lock:
+            running[pool] += 1
+            most[pool] = max(most[pool], running[pool])
+        time.sleep(0.05)
+        with lock:
+            running[pool] -= 1
+
+    def job(num):
+        for pool in ("local", "network", "local"):
+            yield pool
+            step(pool)
+        return num
+
+    jobs = {f"job{num}": (lambda num=num: job(num)) for num in range(8)}
+    results = run_staged_jobs(
+        jobs, {"local": 2, "network": 3}, console=Console(file=io.StringIO())
+    )
+    assert [r.value for r in results.values()] == list(range(8))
+    # Jobs waiting for one pool don't keep the other one from filling up
+    assert most == {"local": 2, "network": 3}
+
+
+def test_staged_jobs_capture_errors():
+    def fail():
+        yield "local"
+        raise ValueError("broken")
+
+    def unknown_pool():
+        yield "elsewhere"
+
+    results = run_staged_jobs(
+        {"bad": fail, "unknown": unknown_pool},
+        {"local": 1},
+        console=Console(file=io.StringIO()),
+    )
+    assert isinstance(results["bad"].error, ValueError)
+    assert isinstance(results["unknown"].error, KeyError)
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import click
+from click.testing import CliRunner
+
+from au.classroom.gh import RateLimitError, RateLimitScheduler
+from au.click.AliasedGroup import AliasedGroup
+from au.classroom.gh_http import HttpResponse
+
+
+def _budget_headers(remaining: int, reset_in: float, resource: str = "core") -> dict:
+    return {
+        "x-ratelimit-resource": resource,
+        "x-ratelimit-limit": "5000",
+        "x-ratelimit-remaining": str(remaining),
+        "x-ratelimit-reset": str(time.time() + reset_in),
+    }
+
+
+def _run_concurrently(*calls) -> dict[str, float]:
+    """Run the named calls in threads at once; {name: seconds it took}."""
+    elapsed: dict[str, float] = {}
+    start = threading.Barrier(len(calls))
+
+    def run(name, call):
+        start.wait()
+        started = time.monotonic()
+        call()
+        elapsed[name] = time.monotonic() - started
+
+    threads = [threading.Thread(target=run, args=call) for call in calls]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(10)
+    return elapsed
+
+
+def test_backoff_only_delays_the_refused_request():
+    scheduler = RateLimitScheduler(base_delay=0.5)
+    refused = threading.Event()
+    responses = [HttpResponse(403, {}, b"secondary rate limit"), HttpResponse(200)]
+
+    def limited_send():
+        resp = responses.pop(0)
+        refused.set()
+        return resp
+
+    def other():
+        refused.wait(2)
+        time.sleep(0.1)
+        scheduler.execute(lambda: HttpResponse(200), "core")
+
+    elapsed = _run_concurrently(
+        ("limited", lambda: scheduler.execute(limited_send, "core")),
+        ("other", other),
+    )
+    assert elapsed["limited"] >= 0.5
+    assert elapsed["other"] < 0.3
+
+
+def test_retry_after_pauses_every_request():
+    scheduler = RateLimitScheduler()
+    responses = [HttpResponse(429, {"retry-after": "0.5"}), HttpResponse(200)]
+
+    thread = threading.Thread(
+        target=scheduler.execute, args=(lambda: responses.pop(0), "core")
+    )
+    thread.start()
+    time.sleep(0.2)
+    started = time.monotonic()
+    scheduler.execute(lambda: HttpResponse(200), "core")
+    # Held back until GitHub's pause is over, like the refused request
+    assert time.monotonic() - started >= 0.2
+    thread.join(10)
+    assert not responses
+
+
+def test_pacing_is_per_resource():
+    scheduler = RateLimitScheduler(reserve=100)
+    # 10 requests left for the next 5 seconds: 0.5s apart
+    for resource in ("core", "graphql"):
+        headers = _budget_headers(10, 5, resource)
+        scheduler.execute(lambda headers=headers: HttpResponse(200, headers), resource)
+
+    def send():
+        return HttpResponse(200)
+
+    elapsed = _run_concurrently(
+        ("core1", lambda: scheduler.execute(send, "core")),
+        ("core2", lambda: scheduler.execute(send, "core")),
+        # After the core requests have taken their slots
+        ("graphql", lambda: (time.sleep(0.05), scheduler.execute(send, "graphql"))),
+    )
+    assert max(elapsed["core1"], elapsed["core2"]) >= 0.4
+    assert elapsed["graphql"] < 0.2
+    # The budget is shared by the threads using it
+    assert scheduler.get_budget("core").remaining == 8
+
+
+def test_rate_limit_is_reported_as_an_error():
+    scheduler = RateLimitScheduler(max_wait=1)
+    headers = _budget_headers(0, 60, "graphql")
+    scheduler.execute(lambda: HttpResponse(200, headers), "graphql")
+
+    @click.group(cls=AliasedGroup)
+    def main():
+        pass
+
+    @main.command()
+    def fetch():
+        scheduler.execute(lambda: HttpResponse(200), "graphql")
+
+    result = CliRunner().invoke(main, ["fetch"])
+    assert result.exit_code == 1
+    assert isinstance(result.exception, SystemExit)
+    assert "resource: graphql" in result.output
+    assert "resets at" in result.output
@@ -0,0 +1,52 @@
+from click.testing import CliRunner
+
+from au.cli.repo import recursive_git as module
+
+
+def run(monkeypatch, tmp_path, args, stderr="", exit_code=0):
+    """
+    Invoke the command on one repo; returns the git commands it ran, the
+    environments they ran in and the output.
+    """
+    repo_dir = tmp_path / "student"
+    repo_dir.mkdir()
+    commands = []
+    envs = []
+
+    def run_git(repo_dir, command, env=None):
+        commands.append(command)
+        envs.append(env)
+        return module._GitResult(repo_dir, returncode=exit_code, stderr=stderr)
+
+    monkeypatch.setattr(module, "get_git_dirs", lambda root_dir: [repo_dir])
+    monkeypatch.setattr(module, "_run_git", run_git)
+    result = CliRunner().invoke(module.recursive_git, args)
+    assert result.exit_code == exit_code, result.output
+    return commands, envs, result.output
+
+
+def test_options_before_root_dir_are_ours(monkeypatch, tmp_path):
+    commands, _, _ = run(
+        monkeypatch, tmp_path, ["--jobs", "4", str(tmp_path), "status"]
+    )
+    assert commands == [("status",)]
+
+
+def test_options_after_root_dir_go_to_git(monkeypatch, tmp_path):
+    commands, _, _ = run(
+        monkeypatch, tmp_path, [str(tmp_path), "--jobs", "4", "status"]
+    )
+    assert commands == [("--jobs", "4", "status")]
+
+
+def test_concurrent_git_does_not_prompt(monkeypatch, tmp_path):
+    stderr = "fatal: could not read Username: terminal prompts disabled\n"
+    args = ["--jobs", "4", str(tmp_path), "pull"]
+    _, envs, output = run(monkeypatch, tmp_path, args, stderr, exit_code=1)
+    assert envs[0]["GIT_TERMINAL_PROMPT"] == "0"
+    assert "AUTH FAILED" in output
+
+
+def test_single_job_may_prompt(monkeypatch, tmp_path):
+    _, envs, _ = run(monkeypatch, tmp_path, ["--jobs", "1", str(tmp_path), "pull"])
+    assert envs == [None]
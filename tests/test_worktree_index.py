@@ -0,0 +1,70 @@
+import subprocess
+
+import pytest
+
+from au.common.worktree_index import (
+    get_current_entry,
+    is_known_clean,
+    record_clean,
+    record_writes,
+)
+
+
+def git(*args, cwd):
+    subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "student"
+    (repo / "pkg").mkdir(parents=True)
+    (repo / ".gitignore").write_text(".venv/\n__pycache__/\n")
+    (repo / "pkg" / "main.py").write_text("print('hello')\n")
+    git("init", "-q", cwd=repo)
+    git("add", ".", cwd=repo)
+    git("-c", "user.name=t", "-c", "user.email=t@t", "commit", "-qm", "i", cwd=repo)
+    return repo
+
+
+def test_clean_right_after_recording(repo):
+    # Everything was just written, so every entry is racily clean
+    record_clean(repo.parent, repo.name)
+    assert is_known_clean(repo.parent, repo.name)
+
+
+def test_ignored_files_do_not_count(repo):
+    record_clean(repo.parent, repo.name)
+    (repo / ".venv").mkdir()
+    (repo / ".venv" / "junk").write_text("junk")
+    (repo / "pkg" / "__pycache__").mkdir()
+    assert is_known_clean(repo.parent, repo.name)
+
+
+def test_modified_file_is_not_clean(repo):
+    record_clean(repo.parent, repo.name)
+    (repo / "pkg" / "main.py").write_text("print('bye!!')\n")
+    assert not is_known_clean(repo.parent, repo.name)
+
+
+def test_recorded_writes(repo):
+    record_clean(repo.parent, repo.name)
+
+    entry = get_current_entry(repo)
+    (repo / "pkg" / "main.py").write_text("print('hello')\n")
+    record_writes(repo, entry)
+    assert is_known_clean(repo.parent, repo.name)
+
+    entry = get_current_entry(repo)
+    (repo / "FEEDBACK.md").write_text("# Feedback\n")
+    record_writes(repo, entry)
+    assert not is_known_clean(repo.parent, repo.name)
+
+
+def test_filtered_content_is_left_to_git(repo):
+    # With autocrlf, the worktree holds CRLF while git stores LF: the raw bytes
+    # differ from the staged blob, yet git status reports no changes
+    git("config", "core.autocrlf", "true", cwd=repo)
+    (repo / "pkg" / "main.py").unlink()
+    git("checkout", "--", "pkg/main.py", cwd=repo)
+    record_clean(repo.parent, repo.name)
+    assert not is_known_clean(repo.parent, repo.name)